@@ -0,0 +1,273 @@
+"""基准测试使用的模拟上游
+
+只替换网络调用本身：YouTube Data API 由本地桩服务提供，字幕下载和 OpenAI 对话接口
+返回合成数据。缓存、请求合并、提示词构建和响应解析仍走真实代码。
+"""
+import asyncio
+import json
+import logging
+import random
+import re
+from types import SimpleNamespace
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
+import openai
+import requests
+
+from youtube_search.client import YouTubeClient
+from youtube_search.llm_cache import LLMResponseCache
+from youtube_search.openai_client import OpenAIClient
+from youtube_search.preprocess import estimate_tokens
+from youtube_search.subtitle import SubtitleFetcher
+from youtube_search.youtube_stub import create_stub_app, make_video_item
+
+logger = logging.getLogger(__name__)
+
+# 合成字幕的词表，包含基准查询会用到的词
+VOCABULARY = (
+    "python asyncio event loop coroutine task cache latency throughput "
+    "database index query memory profile benchmark deploy container "
+    "并发 协程 缓存 延迟 吞吐 数据库 索引 内存 部署 性能"
+).split()
+
+TIMESTAMP_PATTERN = re.compile(r"\[(\d{2}:\d{2})\]")
+
+
+class UpstreamError(Exception):
+    """模拟的上游错误"""
+
+
+class UpstreamProfile:
+    """上游的延迟与错误模型"""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        """初始化上游模型
+
+        Args:
+            latency: 平均延迟（秒）
+            jitter: 延迟的随机波动比例，实际延迟在 latency * (1 ± jitter) 之间
+            error_rate: 调用失败的概率
+            seed: 随机数种子
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    async def call(self, error: Callable[[], Exception] = UpstreamError) -> None:
+        """模拟一次上游调用
+
+        Args:
+            error: 按错误率失败时抛出的异常，使用真实客户端的异常类型以便熔断器计数
+        """
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(
+                self.latency * (1 + self.jitter * self.rng.uniform(-1, 1)))
+        if self.error_rate and self.rng.random() < self.error_rate:
+            raise error()
+
+
+def synthetic_transcript(
+    video_id: str,
+    duration_seconds: float,
+    line_seconds: float = 3.0,
+    words_per_line: int = 10,
+) -> List[Dict]:
+    """生成确定性的合成字幕
+
+    Args:
+        video_id: 视频ID，同一视频总是生成相同的字幕
+        duration_seconds: 视频时长（秒）
+        line_seconds: 每行字幕的时长（秒）
+        words_per_line: 每行字幕的词数
+
+    Returns:
+        List[Dict]: youtube_transcript_api 格式的字幕列表
+    """
+    rng = random.Random(video_id)
+    lines = int(duration_seconds // line_seconds)
+    return [
+        {
+            "text": " ".join(rng.choice(VOCABULARY) for _ in range(words_per_line)),
+            "start": i * line_seconds,
+            "duration": line_seconds,
+        }
+        for i in range(lines)
+    ]
+
+
+def make_youtube_client(
+    profile: UpstreamProfile,
+    video_count: int = 50,
+) -> YouTubeClient:
+    """创建指向本地桩服务的 YouTubeClient
+
+    Args:
+        profile: YouTube Data API 的延迟与错误模型
+        video_count: 桩服务中的视频数
+
+    Returns:
+        YouTubeClient: 通过 ASGITransport 访问桩服务的客户端
+    """
+    stub = create_stub_app(
+        videos=[make_video_item(f"bench{i:04d}", title=f"Benchmark video {i}")
+                for i in range(video_count)],
+        latency=profile.latency,
+        jitter=profile.jitter,
+        error_rate=profile.error_rate,
+        seed=profile.seed,
+    )
+    client = YouTubeClient(
+        api_key="bench",
+        http_client=httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=stub),
+            base_url="http://youtube-stub",
+        ),
+    )
+    # 基准测试的调用量远超每日配额，不做配额调度
+    client.quota = None
+    return client
+
+
+class FakeSubtitleFetcher(SubtitleFetcher):
+    """下载合成字幕的字幕获取器，缓存与请求合并逻辑沿用 SubtitleFetcher"""
+
+    def __init__(self, profile: UpstreamProfile, transcript_seconds: float):
+        """初始化模拟字幕获取器
+
+        Args:
+            profile: 字幕下载的延迟与错误模型
+            transcript_seconds: 每个视频的字幕时长（秒）
+        """
+        super().__init__()
+        self.profile = profile
+        self.transcript_seconds = transcript_seconds
+
+    async def _download_transcript(
+        self,
+        video_id: str,
+        prefer_language: str = None,
+    ) -> Optional[List[Dict]]:
+        try:
+            # 一次往返获取轨道列表并下载选中的轨道
+            await self.breaker.call(lambda: self.profile.call(requests.ConnectionError))
+        except Exception as e:
+            logger.error(f"Error getting transcript for video {video_id}: {str(e)}")
+            return None
+        return synthetic_transcript(video_id, self.transcript_seconds)
+
+
+class FakeCompletions:
+    """模拟 chat.completions 接口，根据提示词生成格式正确的响应"""
+
+    def __init__(self, profile: UpstreamProfile, answer_tokens: int = 200):
+        """初始化模拟对话接口
+
+        Args:
+            profile: OpenAI 的延迟与错误模型
+            answer_tokens: 总结和回答的大致 token 数
+        """
+        self.profile = profile
+        self.answer_tokens = answer_tokens
+
+    async def create(
+        self,
+        model: str,
+        messages: List[Dict],
+        max_tokens: int,
+        temperature: float = 0.7,
+        stream: bool = False,
+        response_format: Optional[Dict] = None,
+        **kwargs,
+    ):
+        await self.profile.call(lambda: openai.APIConnectionError(
+            request=httpx.Request("POST", "http://openai-stub/v1/chat/completions")))
+        prompt = "\n".join(message["content"] for message in messages)
+        content = self._respond(prompt, max_tokens, response_format)
+        usage = SimpleNamespace(
+            prompt_tokens=estimate_tokens(prompt),
+            completion_tokens=estimate_tokens(content),
+        )
+        if stream:
+            return self._stream(content, usage)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=usage,
+        )
+
+    def _respond(
+        self,
+        prompt: str,
+        max_tokens: int,
+        response_format: Optional[Dict],
+    ) -> str:
+        if response_format is not None:
+            # 批量分析：每个视频取字幕中的第一个时间点
+            clips = []
+            for section in prompt.split("视频ID: ")[1:]:
+                video_id = section.split("\n", 1)[0].strip()
+                match = TIMESTAMP_PATTERN.search(section)
+                if match:
+                    clips.append({
+                        "video_id": video_id,
+                        "content": f"Relevant part of {video_id}",
+                        "timestamp": match.group(1),
+                        "relevance": 0.8,
+                    })
+            return json.dumps({"clips": clips})
+
+        if '"clip"' in prompt:
+            match = TIMESTAMP_PATTERN.search(prompt)
+            if not match:
+                return "null"
+            return json.dumps({"clip": {
+                "content": "Relevant part of the video",
+                "timestamp": match.group(1),
+                "relevance": 0.8,
+            }})
+
+        words = min(self.answer_tokens, max_tokens)
+        return " ".join(VOCABULARY[i % len(VOCABULARY)] for i in range(words))
+
+    async def _stream(
+        self,
+        content: str,
+        usage: SimpleNamespace,
+    ) -> AsyncIterator[SimpleNamespace]:
+        words = content.split(" ")
+        for i in range(0, len(words), 8):
+            delta = " ".join(words[i:i + 8]) + " "
+            yield SimpleNamespace(
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))],
+                usage=None,
+            )
+        yield SimpleNamespace(choices=[], usage=usage)
+
+
+def make_openai_client(
+    profile: UpstreamProfile,
+    cache: Optional[LLMResponseCache] = None,
+) -> OpenAIClient:
+    """创建使用模拟对话接口的 OpenAIClient
+
+    Args:
+        profile: OpenAI 的延迟与错误模型
+        cache: LLM 响应缓存，为None时不使用缓存
+
+    Returns:
+        OpenAIClient: 只替换了底层 AsyncOpenAI 的客户端
+    """
+    client = OpenAIClient(api_key="bench", cache=cache)
+    client.client = SimpleNamespace(
+        chat=SimpleNamespace(completions=FakeCompletions(profile)))
+    return client
@@ -0,0 +1,350 @@
+"""YouTubeService 离线基准测试
+
+使用可配置延迟、抖动和错误率的模拟上游驱动 YouTubeService 和 FastAPI 应用，
+报告吞吐量、p50/p95/p99 延迟及峰值内存，并可与保存的基线比较。
+
+示例:
+    PYTHONPATH=src python -m benchmarks.run
+    PYTHONPATH=src python -m benchmarks.run --scenario search analyze --concurrency 50
+    PYTHONPATH=src python -m benchmarks.run --save-baseline
+    PYTHONPATH=src python -m benchmarks.run --compare
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+import structlog
+
+from youtube_search.llm_cache import LLMResponseCache
+from youtube_search.service import YouTubeService
+
+from .fakes import (
+    FakeSubtitleFetcher,
+    UpstreamProfile,
+    make_openai_client,
+    make_youtube_client,
+)
+
+SCENARIOS = ("search", "analyze", "http_search", "http_analyze")
+DEFAULT_BASELINE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+QUERIES = (
+    "asyncio 的事件循环如何工作",
+    "how to profile python memory",
+    "缓存和数据库索引",
+)
+# 不读写 .cache 下的字幕缓存、语料库、会话快照和配额状态，
+# 以免基准数据写入真实文件，磁盘写入也不计入测量结果
+BENCHMARK_ENV = {
+    "OPENAI_API_KEY": "bench",
+    "TRANSCRIPT_CACHE_ENABLED": "false",
+    "CORPUS_ENABLED": "false",
+    "SESSION_SNAPSHOT_PATH": "",
+    "YOUTUBE_QUOTA_STATE_PATH": "",
+    "LLM_CACHE_PATH": "",
+}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="YouTubeService offline benchmark")
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS,
+                        default=list(SCENARIOS), help="scenarios to run")
+    parser.add_argument("--requests", type=int, default=50,
+                        help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10,
+                        help="concurrent clients")
+    parser.add_argument("--videos", type=int, default=5, help="videos per search")
+    parser.add_argument("--keywords", type=int, default=20,
+                        help="distinct keywords; fewer keywords means more cache hits")
+    parser.add_argument("--transcript-minutes", type=float, default=10.0,
+                        help="length of each synthetic transcript")
+    parser.add_argument("--youtube-latency", type=float, default=0.05)
+    parser.add_argument("--youtube-error-rate", type=float, default=0.0)
+    parser.add_argument("--transcript-latency", type=float, default=0.2)
+    parser.add_argument("--transcript-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.2,
+                        help="latency jitter ratio applied to every upstream")
+    parser.add_argument("--llm-cache", action="store_true",
+                        help="enable the in-memory LLM cache")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-memory", action="store_true",
+                        help="do not trace memory "
+                             "(tracemalloc slows allocation-heavy code)")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help="baseline JSON path")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="write results to the baseline path")
+    parser.add_argument("--compare", action="store_true",
+                        help="compare with the baseline and exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative regression before --compare fails")
+    parser.add_argument("--log-level", default="CRITICAL",
+                        help="log level for the service")
+    return parser.parse_args(argv)
+
+
+def isolate_environment() -> None:
+    """设置基准测试的环境变量，已显式设置的保持不变"""
+    for key, value in BENCHMARK_ENV.items():
+        os.environ.setdefault(key, value)
+
+
+def make_service(args: argparse.Namespace) -> YouTubeService:
+    """创建使用模拟上游的服务实例，每个场景使用独立实例以免缓存相互影响"""
+    isolate_environment()
+    service = YouTubeService(
+        youtube_client=make_youtube_client(UpstreamProfile(
+            args.youtube_latency, args.jitter, args.youtube_error_rate, args.seed),
+            video_count=max(50, args.videos)),
+        subtitle_fetcher=FakeSubtitleFetcher(
+            UpstreamProfile(args.transcript_latency, args.jitter,
+                            args.transcript_error_rate, args.seed),
+            transcript_seconds=args.transcript_minutes * 60),
+        openai_client=make_openai_client(
+            UpstreamProfile(
+                args.llm_latency, args.jitter, args.llm_error_rate, args.seed),
+            cache=LLMResponseCache() if args.llm_cache else None),
+    )
+    # 不读写会话快照，以免不同场景和多次运行之间相互影响
+    service.sessions.snapshot_path = None
+    return service
+
+
+def percentile(values: List[float], p: float) -> float:
+    """最近秩法计算百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+async def drive(
+    call: Callable[[int], Awaitable[None]],
+    requests: int,
+    concurrency: int,
+    trace_memory: bool,
+) -> Dict:
+    """以固定并发执行 requests 次调用并统计结果
+
+    Args:
+        call: 接收请求序号的协程函数，抛出异常视为失败
+        requests: 请求总数
+        concurrency: 并发数
+        trace_memory: 是否用 tracemalloc 记录峰值内存
+
+    Returns:
+        Dict: 吞吐量、延迟分位数及峰值内存
+    """
+    latencies: List[float] = []
+    errors = 0
+    pending = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in pending:
+            start = time.perf_counter()
+            try:
+                await call(i)
+            except Exception:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "requests": requests,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "mean": (round(sum(latencies) / len(latencies) * 1000, 2)
+                     if latencies else 0.0),
+            "max": round(max(latencies, default=0.0) * 1000, 2),
+        },
+        "peak_memory_mb": round(peak / 1024 / 1024, 2) if trace_memory else None,
+    }
+
+
+def load_app(service: YouTubeService):
+    """导入 FastAPI 应用并替换其服务实例"""
+    isolate_environment()
+    from youtube_search import web
+
+    web.youtube_service = service
+    return web.app
+
+
+async def create_sessions(
+    service: YouTubeService,
+    args: argparse.Namespace,
+) -> List[str]:
+    """为分析场景预先创建会话（不计入耗时）"""
+    responses = await asyncio.gather(*(
+        service.search_videos(f"keyword {i}", args.videos)
+        for i in range(args.keywords)))
+    return [response.session_id for response in responses]
+
+
+async def run_scenario(name: str, args: argparse.Namespace) -> Dict:
+    """运行单个场景"""
+    service = make_service(args)
+    await service.start()
+    http = None
+    try:
+        if name == "search":
+            async def call(i: int) -> None:
+                await service.search_videos(f"keyword {i % args.keywords}", args.videos)
+
+        elif name == "analyze":
+            session_ids = await create_sessions(service, args)
+
+            async def call(i: int) -> None:
+                await service.search_session_content(
+                    session_ids[i % len(session_ids)], QUERIES[i % len(QUERIES)])
+
+        else:
+            http = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=load_app(service)),
+                base_url="http://bench", timeout=None)
+
+            if name == "http_search":
+                async def call(i: int) -> None:
+                    response = await http.post("/search", json={
+                        "keyword": f"keyword {i % args.keywords}",
+                        "max_results": args.videos,
+                    })
+                    response.raise_for_status()
+
+            else:
+                session_ids = await create_sessions(service, args)
+
+                async def call(i: int) -> None:
+                    session_id = session_ids[i % len(session_ids)]
+                    response = await http.post(f"/sessions/{session_id}/analyze", json={
+                        "session_id": session_id,
+                        "query": QUERIES[i % len(QUERIES)],
+                    })
+                    response.raise_for_status()
+
+        return await drive(call, args.requests, args.concurrency, not args.skip_memory)
+    finally:
+        if http is not None:
+            await http.aclose()
+        await service.close()
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """与基线比较，返回超出容差的退化项
+
+    Args:
+        results: 本次结果
+        baseline: 基线结果
+        tolerance: 允许的相对退化比例
+
+    Returns:
+        List[str]: 退化说明列表
+    """
+    regressions = []
+    for name, current in results["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+        for key in ("p50", "p95", "p99"):
+            old, new = base["latency_ms"][key], current["latency_ms"][key]
+            if old and (new - old) / old > tolerance:
+                regressions.append(f"{name} {key}: {old:.1f}ms -> {new:.1f}ms")
+        old, new = base["throughput_rps"], current["throughput_rps"]
+        if old and (old - new) / old > tolerance:
+            regressions.append(f"{name} throughput: {old:.1f} -> {new:.1f} req/s")
+        old, new = base.get("peak_memory_mb"), current.get("peak_memory_mb")
+        if old and new and (new - old) / old > tolerance:
+            regressions.append(f"{name} peak memory: {old:.1f}MB -> {new:.1f}MB")
+    return regressions
+
+
+def print_report(results: Dict) -> None:
+    header = (f"{'scenario':<14}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+              f"{'p99 ms':>10}{'errors':>8}{'peak MB':>10}")
+    print(header)
+    print("-" * len(header))
+    for name, result in results["scenarios"].items():
+        latency = result["latency_ms"]
+        peak = result["peak_memory_mb"]
+        print(f"{name:<14}{result['throughput_rps']:>10.1f}{latency['p50']:>10.1f}"
+              f"{latency['p95']:>10.1f}{latency['p99']:>10.1f}{result['errors']:>8}"
+              f"{'-' if peak is None else format(peak, '.1f'):>10}")
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    results = {
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {
+            key: value for key, value in vars(args).items()
+            if key not in ("output", "baseline", "save_baseline", "compare",
+                           "tolerance", "log_level")
+        },
+        "scenarios": {},
+    }
+    for name in args.scenario:
+        results["scenarios"][name] = await run_scenario(name, args)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    level = getattr(logging, args.log_level.upper())
+    logging.basicConfig(level=level)
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(level))
+
+    results = asyncio.run(run(args))
+    print_report(results)
+
+    paths = [args.output, args.baseline if args.save_baseline else None]
+    for path in filter(None, paths):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"Results written to {path}")
+
+    if args.compare:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print("Warning: baseline was recorded with a different configuration")
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} of {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
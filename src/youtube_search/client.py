@@ -1,26 +1,104 @@
+import asyncio
 from datetime import datetime
+import logging
 import re
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+import httpx
 
+from .cache import TTLCache
+from .metrics import track_stage
 from .models import VideoInfo
+from .quota import (
+    QUOTA_COSTS,
+    QuotaExceededError,
+    QuotaScheduler,
+    create_quota_scheduler,
+)
+from .resilience import CircuitBreaker, create_circuit_breaker
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+YOUTUBE_API_BASE_URL = "https://www.googleapis.com/youtube/v3"
+# search.list 单页最大结果数，同时也是 videos.list 单次请求的最大ID数
+MAX_PAGE_SIZE = 50
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """网络错误、5xx 和 429 计为 YouTube Data API 故障，其余 4xx 不计入熔断"""
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status == 429
+    return isinstance(error, httpx.TransportError)
+
+
+def is_quota_error(response: httpx.Response) -> bool:
+    """判断 403 响应是否为配额耗尽"""
+    if response.status_code != 403:
+        return False
+    try:
+        errors = response.json()["error"]["errors"]
+    except (ValueError, KeyError, TypeError):
+        return False
+    return any(
+        error.get("reason") in ("quotaExceeded", "dailyLimitExceeded")
+        for error in errors
+    )
 
 
 class YouTubeClient:
-    """YouTube API 客户端"""
+    """YouTube Data API 异步客户端，基于 httpx 连接池"""
 
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        search_cache_ttl: float = 600,
+        video_cache_ttl: float = 3600,
+        search_cache_size: int = 1024,
+        video_cache_size: int = 10000,
+        base_url: str = YOUTUBE_API_BASE_URL,
+        timeout: float = 10.0,
+        max_connections: int = 20,
+        http_client: Optional[httpx.AsyncClient] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        quota: Optional[QuotaScheduler] = None,
+    ):
         """初始化客户端
 
         Args:
             api_key: YouTube API 密钥
+            search_cache_ttl: 搜索结果（关键词 -> 视频ID列表）缓存有效期（秒）
+            video_cache_ttl: 视频元数据（视频ID -> VideoInfo）缓存有效期（秒）
+            search_cache_size: 搜索结果缓存最大条目数
+            video_cache_size: 视频元数据缓存最大条目数
+            base_url: API 根地址，测试时可指向本地桩服务
+            timeout: 单次请求超时时间（秒）
+            max_connections: 连接池最大连接数
+            http_client: 外部传入的 httpx 客户端，为None时自动创建
+            breaker: 熔断器，为None时按环境变量创建
+            quota: 配额调度器，为None时按环境变量创建
         """
-        self.youtube = build('youtube', 'v3', developerKey=api_key)
+        self.api_key = api_key
+        self.http = http_client or httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+        self._search_cache = TTLCache(maxsize=search_cache_size, ttl=search_cache_ttl)
+        self._video_cache = TTLCache(maxsize=video_cache_size, ttl=video_cache_ttl)
+        self._flights = SingleFlight()
+        self.breaker = breaker or create_circuit_breaker(
+            "youtube", is_failure=is_upstream_failure)
+        self.quota = quota or create_quota_scheduler()
 
     async def search_videos(self, query: str, max_results: int = 3) -> List[VideoInfo]:
-        """搜索视频
+        """搜索视频，重复的关键词和已获取过的视频直接从缓存返回，
+        相同关键词的并发请求合并为一次
 
         Args:
             query: 搜索关键词
@@ -29,51 +107,260 @@ class YouTubeClient:
         Returns:
             List[VideoInfo]: 视频信息列表
         """
+        videos = await self._flights.do(
+            ("search", query, max_results),
+            lambda: self._search_videos(query, max_results))
+        return list(videos)
+
+    async def _search_videos(self, query: str, max_results: int) -> List[VideoInfo]:
+        """搜索视频并获取详细信息，API 出错时返回空列表"""
         try:
-            # 搜索视频
-            search_response = self.youtube.search().list(
-                q=query,
-                part='id,snippet',
-                type='video',
-                maxResults=max_results,
-                videoCaption='any'
-            ).execute()
-
-            # 获取视频ID列表
-            video_ids = [item['id']['videoId']
-                         for item in search_response['items']]
-
-            # 获取视频详细信息
-            videos_response = self.youtube.videos().list(
-                part='snippet,contentDetails,statistics',
-                id=','.join(video_ids)
-            ).execute()
-
-            # 解析视频信息
-            videos = []
-            for item in videos_response['items']:
-                video = VideoInfo(
-                    video_id=item['id'],
-                    title=item['snippet']['title'],
-                    channel_title=item['snippet']['channelTitle'],
-                    duration=self._format_duration(
-                        item['contentDetails']['duration']),
-                    view_count=int(item['statistics'].get('viewCount', 0)),
-                    published_at=datetime.strptime(
-                        item['snippet']['publishedAt'], '%Y-%m-%dT%H:%M:%SZ'),
-                    thumbnail_url=item['snippet']['thumbnails']['high']['url'],
-                    description=item['snippet']['description'],
-                    has_subtitles=False,  # 默认值，后续会更新
-                    languages=[]  # 默认值，后续会更新
-                )
-                videos.append(video)
-
-            return videos
-
-        except HttpError as e:
-            print(f'YouTube API 错误: {e}')
+            video_ids = await self._search_video_ids(query, max_results)
+            return await self.get_videos(video_ids)
+
+        except httpx.HTTPError as e:
+            logger.warning(f"YouTube search failed for {query!r}: {e}")
             return []
 
+    async def search_videos_batch(
+        self,
+        queries: List[str],
+        max_results: int = 3,
+    ) -> Dict[str, List[VideoInfo]]:
+        """并发搜索多个关键词，所有结果的视频ID去重后统一获取元数据
+
+        Args:
+            queries: 搜索关键词列表
+            max_results: 每个关键词的最大返回结果数
+
+        Returns:
+            Dict[str, List[VideoInfo]]: 关键词 -> 视频信息列表，同一视频在各关键词间
+                共享同一个 VideoInfo；单个关键词搜索出错时其结果为空列表
+        """
+        async def search_ids(query: str) -> List[str]:
+            try:
+                return await self._search_video_ids(query, max_results)
+            except httpx.HTTPError as e:
+                logger.warning(f"YouTube search failed for {query!r}: {e}")
+                return []
+
+        id_lists = await asyncio.gather(*(search_ids(query) for query in queries))
+        unique_ids = list(dict.fromkeys(
+            video_id for video_ids in id_lists for video_id in video_ids))
+        try:
+            fetched = await self.get_videos(unique_ids)
+            videos = {video.video_id: video for video in fetched}
+        except httpx.HTTPError as e:
+            logger.warning(
+                f"YouTube videos.list failed for {len(unique_ids)} videos: {e}")
+            videos = {}
+
+        return {
+            query: [videos[video_id] for video_id in video_ids if video_id in videos]
+            for query, video_ids in zip(queries, id_lists)
+        }
+
+    async def close(self) -> None:
+        """关闭连接池，保存已用配额"""
+        await self.http.aclose()
+        if self.quota is not None:
+            self.quota.save_state()
+
+    async def _get(self, resource: str, params: Dict) -> Dict:
+        """经熔断器和配额调度器调用 YouTube Data API 的 GET 接口
+
+        受当前请求的截止时间约束。
+
+        Args:
+            resource: 资源名称，如 search、videos
+            params: 查询参数
+
+        Returns:
+            Dict: 解析后的 JSON 响应
+
+        Raises:
+            QuotaExceededError: 配额不足或 API 返回配额耗尽
+            CircuitOpenError: YouTube 熔断器打开
+            DeadlineExceeded: 请求截止时间已过
+        """
+        async def request() -> Dict:
+            # 熔断器放行后才申请配额，被拒绝的调用不消耗配额和令牌
+            if self.quota is not None:
+                await self.quota.acquire(QUOTA_COSTS.get(resource, 1), resource)
+            response = await self.http.get(
+                f"/{resource}", params={**params, "key": self.api_key})
+            if is_quota_error(response):
+                if self.quota is not None:
+                    self.quota.exhaust()
+                    raise QuotaExceededError(self.quota.seconds_until_reset())
+                raise QuotaExceededError(0)
+            response.raise_for_status()
+            return response.json()
+
+        with track_stage(f"youtube_{resource}_list"):
+            return await self.breaker.call(request)
+
+    def _quota_low(self) -> bool:
+        return self.quota is not None and self.quota.is_low()
+
+    def _served_stale(self, count: int = 1) -> None:
+        if self.quota is not None:
+            self.quota.stale_served += count
+
+    async def _search_video_ids(self, query: str, max_results: int) -> List[str]:
+        """搜索视频并返回有序的视频ID列表
+
+        search.list 每次消耗 100 单位配额。配额紧张时优先返回已过期的缓存结果，
+        配额耗尽时也以过期结果兜底。
+
+        Args:
+            query: 搜索关键词
+            max_results: 最大返回结果数
+
+        Returns:
+            List[str]: 去重后的视频ID列表
+        """
+        cache_key = (query, max_results)
+        # get 会删除过期条目，先取出过期结果备用
+        stale = self._search_cache.peek(cache_key)
+        video_ids = self._search_cache.get(cache_key)
+        if video_ids is not None:
+            return list(video_ids)
+        if stale is not None and self._quota_low():
+            self._served_stale()
+            return list(stale)
+
+        try:
+            video_ids = await self._fetch_video_ids(query, max_results)
+        except QuotaExceededError:
+            if stale is None:
+                raise
+            self._served_stale()
+            return list(stale)
+        self._search_cache.set(cache_key, tuple(video_ids))
+        return video_ids
+
+    async def _fetch_video_ids(self, query: str, max_results: int) -> List[str]:
+        """调用 search.list，超过单页上限时按 nextPageToken 翻页
+
+        Args:
+            query: 搜索关键词
+            max_results: 最大返回结果数
+
+        Returns:
+            List[str]: 去重后的视频ID列表
+        """
+        video_ids = []
+        seen = set()
+        page_token = None
+        while len(video_ids) < max_results:
+            params = {
+                'q': query,
+                'part': 'id,snippet',
+                'type': 'video',
+                'maxResults': min(max_results - len(video_ids), MAX_PAGE_SIZE),
+                'videoCaption': 'any',
+            }
+            if page_token:
+                params['pageToken'] = page_token
+            search_response = await self._get('search', params)
+
+            # 不同页之间可能出现重复的视频
+            for item in search_response['items']:
+                video_id = item['id']['videoId']
+                if video_id not in seen:
+                    seen.add(video_id)
+                    video_ids.append(video_id)
+
+            page_token = search_response.get('nextPageToken')
+            if not page_token or not search_response['items']:
+                break
+
+        return video_ids[:max_results]
+
+    async def get_videos(self, video_ids: List[str]) -> List[VideoInfo]:
+        """获取视频详细信息，只请求缓存中缺失的视频，每次请求最多 50 个ID
+
+        配额紧张时已过期的缓存条目直接使用；配额耗尽时以过期条目兜底，
+        没有可用的过期条目才抛出异常。
+
+        Args:
+            video_ids: 视频ID列表
+
+        Returns:
+            List[VideoInfo]: 视频信息列表，顺序与 video_ids 一致
+        """
+        stale = {video_id: self._video_cache.peek(video_id) for video_id in video_ids}
+        cached = {video_id: self._video_cache.get(video_id) for video_id in video_ids}
+        missing_ids = [
+            video_id for video_id, video in cached.items() if video is None
+        ]
+
+        if missing_ids and self._quota_low():
+            missing_ids = self._fill_stale(missing_ids, stale, cached)
+
+        if missing_ids:
+            try:
+                # 按 videos.list 的ID数上限分批并发获取视频详细信息
+                responses = await asyncio.gather(*(
+                    self._get('videos', {
+                        'part': 'snippet,contentDetails,statistics',
+                        'id': ','.join(missing_ids[i:i + MAX_PAGE_SIZE]),
+                    })
+                    for i in range(0, len(missing_ids), MAX_PAGE_SIZE)
+                ))
+            except QuotaExceededError:
+                if all(stale[video_id] is None for video_id in missing_ids):
+                    raise
+                self._fill_stale(missing_ids, stale, cached)
+                responses = []
+
+            for videos_response in responses:
+                for item in videos_response['items']:
+                    video = self._parse_video(item)
+                    self._video_cache.set(video.video_id, video)
+                    cached[video.video_id] = video
+
+        return [cached[video_id] for video_id in video_ids
+                if cached.get(video_id) is not None]
+
+    def _fill_stale(
+        self,
+        missing_ids: List[str],
+        stale: Dict[str, Optional[VideoInfo]],
+        cached: Dict[str, Optional[VideoInfo]],
+    ) -> List[str]:
+        """用已过期的缓存条目补齐缺失的视频，返回仍然缺失的视频ID"""
+        served = [video_id for video_id in missing_ids if stale[video_id] is not None]
+        for video_id in served:
+            cached[video_id] = stale[video_id]
+        self._served_stale(len(served))
+        return [video_id for video_id in missing_ids if stale[video_id] is None]
+
+    def _parse_video(self, item: Dict) -> VideoInfo:
+        """解析 videos.list 返回的单个视频条目
+
+        Args:
+            item: videos.list 响应中的视频条目
+
+        Returns:
+            VideoInfo: 视频信息
+        """
+        return VideoInfo(
+            video_id=item['id'],
+            title=item['snippet']['title'],
+            channel_title=item['snippet']['channelTitle'],
+            duration=self._format_duration(
+                item['contentDetails']['duration']),
+            view_count=int(item['statistics'].get('viewCount', 0)),
+            published_at=datetime.strptime(
+                item['snippet']['publishedAt'], '%Y-%m-%dT%H:%M:%SZ'),
+            thumbnail_url=item['snippet']['thumbnails']['high']['url'],
+            description=item['snippet']['description'],
+            has_subtitles=False,  # 默认值，后续会更新
+            languages=[]  # 默认值，后续会更新
+        )
+
     def _format_duration(self, duration: str) -> str:
         """将ISO 8601格式的时长转换为人类可读格式
 
@@ -0,0 +1,238 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from .models import VideoInfo
+from .search_index import tokenize
+from .transcript import CompactTranscript
+
+logger = logging.getLogger(__name__)
+
+
+class CorpusDisabledError(Exception):
+    """字幕语料库未启用（CORPUS_ENABLED=false 或数据库打开失败）"""
+
+
+class TranscriptCorpus:
+    """基于 SQLite FTS5 的持久化字幕语料库
+
+    保存所有入库过的视频元数据和预处理后的字幕片段，会话过期后仍可检索。
+    FTS5 默认分词器不切分中日韩文字，因此索引列存放 search_index.tokenize
+    的切分结果（中日韩文字按单字和 bigram），查询使用同样的切分方式。
+    """
+
+    def __init__(self, path: str):
+        """初始化语料库
+
+        Args:
+            path: SQLite 数据库文件路径
+        """
+        self.path = path
+        self.upserts = 0
+        self.unchanged = 0
+        self.searches = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS videos (
+                video_id TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                channel_title TEXT NOT NULL,
+                duration TEXT NOT NULL,
+                view_count INTEGER NOT NULL,
+                published_at TEXT NOT NULL,
+                thumbnail_url TEXT NOT NULL,
+                description TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                content_hash TEXT NOT NULL DEFAULT ''
+            );
+            CREATE TABLE IF NOT EXISTS segments (
+                id INTEGER PRIMARY KEY,
+                video_id TEXT NOT NULL,
+                start REAL NOT NULL,
+                duration REAL NOT NULL,
+                text TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_segments_video ON segments (video_id);
+            -- rowid 与 segments.id 对应
+            CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(tokens);
+            """
+        )
+        # 早期版本的 videos 表没有 content_hash 列
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(videos)")}
+        if "content_hash" not in columns:
+            self._conn.execute(
+                "ALTER TABLE videos ADD COLUMN content_hash TEXT NOT NULL DEFAULT ''")
+        self._conn.commit()
+
+    @staticmethod
+    def _content_hash(transcript: CompactTranscript) -> str:
+        """字幕片段内容的摘要，用于跳过未变化的重复写入"""
+        digest = hashlib.sha1()
+        for sub in transcript:
+            digest.update(f"{sub['start']}\t{sub['duration']}\t{sub['text']}\n".encode())
+        return digest.hexdigest()
+
+    def upsert(self, video: VideoInfo, transcript: CompactTranscript) -> None:
+        """写入视频元数据和字幕片段，已存在的视频整体替换
+
+        字幕内容未变化时（字幕缓存命中、同一视频出现在多个会话或关键词中）
+        只更新有变化的元数据，不重写片段和全文索引。
+
+        Args:
+            video: 视频信息
+            transcript: 预处理后的列式字幕
+        """
+        content_hash = self._content_hash(transcript)
+        metadata = (
+            video.title, video.channel_title, video.duration or "", video.view_count,
+            video.published_at.isoformat(), video.thumbnail_url, video.description,
+        )
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT title, channel_title, duration, view_count, published_at, "
+                "thumbnail_url, description, content_hash "
+                "FROM videos WHERE video_id = ?",
+                (video.video_id,),
+            ).fetchone()
+            if row is not None and row[-1] == content_hash:
+                self.unchanged += 1
+                if tuple(row[:-1]) != metadata:
+                    self._conn.execute(
+                        "UPDATE videos SET title = ?, channel_title = ?, duration = ?, "
+                        "view_count = ?, published_at = ?, thumbnail_url = ?, "
+                        "description = ?, updated_at = ? WHERE video_id = ?",
+                        (*metadata, time.time(), video.video_id),
+                    )
+                    self._conn.commit()
+                return
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO videos "
+                "(video_id, title, channel_title, duration, view_count, published_at, "
+                "thumbnail_url, description, updated_at, content_hash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (video.video_id, *metadata, time.time(), content_hash),
+            )
+            self._conn.execute(
+                "DELETE FROM segments_fts WHERE rowid IN "
+                "(SELECT id FROM segments WHERE video_id = ?)",
+                (video.video_id,),
+            )
+            self._conn.execute(
+                "DELETE FROM segments WHERE video_id = ?", (video.video_id,))
+            # 显式分配片段ID，片段和全文索引都可以批量插入
+            first_id = self._conn.execute(
+                "SELECT COALESCE(MAX(id), 0) + 1 FROM segments").fetchone()[0]
+            subs = list(transcript)
+            self._conn.executemany(
+                "INSERT INTO segments (id, video_id, start, duration, text) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (first_id + i, video.video_id, sub["start"], sub["duration"],
+                     sub["text"])
+                    for i, sub in enumerate(subs)
+                ],
+            )
+            self._conn.executemany(
+                "INSERT INTO segments_fts (rowid, tokens) VALUES (?, ?)",
+                [
+                    (first_id + i, " ".join(tokenize(sub["text"])))
+                    for i, sub in enumerate(subs)
+                ],
+            )
+            self._conn.commit()
+            self.upserts += 1
+
+    def search(self, query: str, limit: int = 20) -> List[Dict]:
+        """全文检索字幕片段，按 BM25 得分排序
+
+        Args:
+            query: 查询文本
+            limit: 最多返回的片段数
+
+        Returns:
+            List[Dict]: 片段列表，每项包含 video_id、video_title、channel_title、
+                text、start、duration 和 score（越大越相关）
+        """
+        # 检索词只含字母数字和中日韩文字，加引号避免被解析为 FTS5 运算符
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        match = " OR ".join(f'"{term}"' for term in terms)
+
+        with self._lock:
+            self.searches += 1
+            rows = self._conn.execute(
+                "SELECT s.video_id, v.title, v.channel_title, "
+                "s.text, s.start, s.duration, bm25(segments_fts) AS rank "
+                "FROM segments_fts "
+                "JOIN segments s ON s.id = segments_fts.rowid "
+                "JOIN videos v ON v.video_id = s.video_id "
+                "WHERE segments_fts MATCH ? "
+                "ORDER BY rank LIMIT ?",
+                (match, limit),
+            ).fetchall()
+
+        return [
+            {
+                "video_id": video_id,
+                "video_title": title,
+                "channel_title": channel_title,
+                "text": text,
+                "start": start,
+                "duration": duration,
+                # bm25() 越小越相关
+                "score": -rank,
+            }
+            for video_id, title, channel_title, text, start, duration, rank in rows
+        ]
+
+    def stats(self) -> Dict:
+        """获取语料库统计信息"""
+        with self._lock:
+            videos = self._conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+            segments = self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        return {
+            "videos": videos,
+            "segments": segments,
+            "upserts": self.upserts,
+            "unchanged": self.unchanged,
+            "searches": self.searches,
+        }
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+def create_corpus() -> Optional[TranscriptCorpus]:
+    """根据环境变量创建字幕语料库
+
+    环境变量:
+        CORPUS_ENABLED: 设为 false/0 时关闭语料库
+        CORPUS_PATH: 语料库数据库路径
+
+    Returns:
+        Optional[TranscriptCorpus]: 语料库实例，关闭或创建失败时返回None
+    """
+    if os.getenv("CORPUS_ENABLED", "true").lower() in ("false", "0", "no"):
+        return None
+
+    try:
+        return TranscriptCorpus(os.getenv("CORPUS_PATH", ".cache/corpus.db"))
+    except (sqlite3.Error, OSError) as e:
+        logger.error(f"Failed to open transcript corpus: {str(e)}")
+        return None
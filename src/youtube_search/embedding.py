@@ -0,0 +1,196 @@
+import logging
+import os
+import zlib
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from openai import AsyncOpenAI
+
+from .search_index import SubtitleWindow, tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingProvider(ABC):
+    """文本向量化接口，返回 L2 归一化的 float32 矩阵"""
+
+    dimension: int = 0
+
+    @abstractmethod
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """将文本列表转换为向量
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            np.ndarray: 形状为 (len(texts), dimension) 的归一化向量矩阵
+        """
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    """按行做 L2 归一化，零向量保持不变"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+class HashingEmbedder(EmbeddingProvider):
+    """基于特征哈希的本地向量化，确定性且无需网络，适合离线环境和测试"""
+
+    def __init__(self, dimension: int = 512):
+        """初始化哈希向量化器
+
+        Args:
+            dimension: 向量维度
+        """
+        self.dimension = dimension
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                # crc32 跨进程稳定，不受 PYTHONHASHSEED 影响
+                h = zlib.crc32(token.encode("utf-8"))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                matrix[row, h % self.dimension] += sign
+        return _normalize(matrix)
+
+
+class OpenAIEmbedder(EmbeddingProvider):
+    """基于 OpenAI Embeddings API 的向量化"""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: str = "text-embedding-3-small",
+        dimension: int = 1536,
+        batch_size: int = 256,
+    ):
+        """初始化 OpenAI 向量化器
+
+        Args:
+            api_key: OpenAI API key
+            model: 向量模型名称
+            dimension: 向量维度
+            batch_size: 单次请求的最大文本数
+        """
+        self.client = AsyncOpenAI(
+            api_key=api_key or os.getenv("OPENAI_API_KEY"), timeout=30.0)
+        self.model = model
+        self.dimension = dimension
+        self.batch_size = batch_size
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            response = await self.client.embeddings.create(
+                model=self.model,
+                input=texts[i:i + self.batch_size],
+                dimensions=self.dimension,
+            )
+            vectors.extend(item.embedding for item in response.data)
+        if not vectors:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return _normalize(np.asarray(vectors, dtype=np.float32))
+
+
+def create_embedding_provider() -> Optional[EmbeddingProvider]:
+    """根据环境变量创建向量化器
+
+    环境变量:
+        EMBEDDING_PROVIDER: hashing（默认）、openai 或 none
+
+    Returns:
+        Optional[EmbeddingProvider]: 向量化器，设为 none 时返回None
+    """
+    provider = os.getenv("EMBEDDING_PROVIDER", "hashing").lower()
+    if provider == "none":
+        return None
+    if provider == "openai":
+        return OpenAIEmbedder(model=os.getenv(
+            "EMBEDDING_MODEL", "text-embedding-3-small"))
+    return HashingEmbedder()
+
+
+class VectorIndex:
+    """字幕窗口向量索引，向量存储在连续的 NumPy 矩阵中"""
+
+    def __init__(self):
+        self.windows: List[SubtitleWindow] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.windows)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """与 windows 一一对应的向量矩阵（只读视图，不含预留容量）"""
+        if self._matrix is None:
+            return np.empty((0, 0), dtype=np.float32)
+        view = self._matrix[:len(self.windows)]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def nbytes(self) -> int:
+        """向量矩阵占用的字节数"""
+        return 0 if self._matrix is None else self._matrix.nbytes
+
+    def add(self, windows: Sequence[SubtitleWindow], vectors: np.ndarray) -> None:
+        """加入字幕窗口及其向量，矩阵容量按倍数增长以减少拷贝
+
+        Args:
+            windows: 字幕窗口列表
+            vectors: 对应的归一化向量矩阵
+        """
+        if not len(windows):
+            return
+
+        size = len(self.windows)
+        needed = size + len(windows)
+        if self._matrix is None:
+            self._matrix = np.empty((needed, vectors.shape[1]), dtype=np.float32)
+        elif needed > self._matrix.shape[0]:
+            grown = np.empty(
+                (max(needed, self._matrix.shape[0] * 2), self._matrix.shape[1]),
+                dtype=np.float32)
+            grown[:size] = self._matrix[:size]
+            self._matrix = grown
+
+        self._matrix[size:needed] = vectors
+        self.windows.extend(windows)
+
+    def top_windows(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = 3,
+        min_score: float = 0.0,
+    ) -> Dict[str, List[Tuple[SubtitleWindow, float]]]:
+        """按余弦相似度返回每个视频得分最高的窗口
+
+        Args:
+            query_vector: 归一化的查询向量
+            top_k: 每个视频最多返回的窗口数
+            min_score: 最低相似度，低于该值的窗口被忽略
+
+        Returns:
+            Dict[str, List[Tuple[SubtitleWindow, float]]]: 视频ID -> [(窗口, 相似度)]，
+                按相似度从高到低排序
+        """
+        if self._matrix is None:
+            return {}
+
+        scores = self._matrix[:len(self.windows)] @ query_vector
+        candidates = np.nonzero(scores > min_score)[0]
+        ordered = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        by_video: Dict[str, List[Tuple[SubtitleWindow, float]]] = defaultdict(list)
+        for doc_id in ordered:
+            window = self.windows[doc_id]
+            hits = by_video[window.video_id]
+            if len(hits) < top_k:
+                hits.append((window, float(scores[doc_id])))
+        return dict(by_video)
@@ -0,0 +1,203 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class SqliteResponseStore:
+    """LLM 响应的 SQLite 持久化存储"""
+
+    def __init__(self, path: str):
+        """初始化持久化存储
+
+        Args:
+            path: SQLite 数据库文件路径
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= time.time():
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return row[0]
+
+    def set(self, key: str, content: str, ttl: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, content, expires_at) "
+                "VALUES (?, ?, ?)",
+                (key, content, time.time() + ttl),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class LLMResponseCache:
+    """按请求内容寻址的 LLM 响应缓存
+
+    以模型、消息和采样参数的哈希为键，先查内存 LRU，再查可选的持久化存储。
+    temperature 大于 0 的请求结果不确定，默认不缓存。
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 2048,
+        ttl: float = 24 * 3600,
+        store: Optional[SqliteResponseStore] = None,
+        allow_nondeterministic: bool = False,
+    ):
+        """初始化响应缓存
+
+        Args:
+            maxsize: 内存缓存最大条目数
+            ttl: 缓存有效期（秒）
+            store: 持久化存储，为None时只使用内存缓存
+            allow_nondeterministic: 是否缓存 temperature 大于 0 的请求
+        """
+        self.ttl = ttl
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.store = store
+        self.allow_nondeterministic = allow_nondeterministic
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    @staticmethod
+    def make_key(**request: Any) -> str:
+        """根据请求参数计算缓存键
+
+        Args:
+            request: 模型、消息及采样参数
+
+        Returns:
+            str: 请求内容的 SHA-256 摘要
+        """
+        payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def is_cacheable(self, temperature: float) -> bool:
+        """判断请求是否可以使用缓存，不可缓存时计入 bypassed"""
+        if temperature > 0 and not self.allow_nondeterministic:
+            self.bypassed += 1
+            return False
+        return True
+
+    async def get(self, key: str) -> Optional[str]:
+        """读取缓存，持久化存储命中时回填内存缓存
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            Optional[str]: 缓存的响应内容，未命中返回None
+        """
+        content = self.memory.get(key)
+        if content is None and self.store is not None:
+            try:
+                content = await asyncio.get_running_loop().run_in_executor(
+                    None, self.store.get, key)
+            except Exception as e:
+                logger.error(f"Error reading LLM response cache: {str(e)}")
+            if content is not None:
+                self.memory.set(key, content)
+
+        if content is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return content
+
+    async def set(self, key: str, content: str) -> None:
+        """写入缓存
+
+        Args:
+            key: 缓存键
+            content: 响应内容
+        """
+        self.memory.set(key, content)
+        if self.store is not None:
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.store.set, key, content, self.ttl)
+            except Exception as e:
+                logger.error(f"Error writing LLM response cache: {str(e)}")
+
+    def stats(self) -> Dict:
+        """获取缓存统计信息"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "persistent": self.store is not None,
+        }
+
+
+def create_llm_cache() -> Optional[LLMResponseCache]:
+    """根据环境变量创建 LLM 响应缓存
+
+    环境变量:
+        LLM_CACHE_ENABLED: 设为 false/0 时关闭缓存
+        LLM_CACHE_SIZE: 内存缓存最大条目数
+        LLM_CACHE_TTL: 缓存有效期（秒）
+        LLM_CACHE_PATH: 持久化存储路径，为空时只使用内存缓存
+        LLM_CACHE_ALLOW_NONDETERMINISTIC: 是否缓存 temperature 大于 0 的请求
+
+    Returns:
+        Optional[LLMResponseCache]: 响应缓存实例，关闭时返回None
+    """
+    if os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("false", "0", "no"):
+        return None
+
+    store = None
+    path = os.getenv("LLM_CACHE_PATH", "")
+    if path:
+        try:
+            store = SqliteResponseStore(path)
+        except (sqlite3.Error, OSError) as e:
+            logger.error(f"Failed to open LLM response cache: {str(e)}")
+
+    return LLMResponseCache(
+        maxsize=int(os.getenv("LLM_CACHE_SIZE", 2048)),
+        ttl=float(os.getenv("LLM_CACHE_TTL", 24 * 3600)),
+        store=store,
+        allow_nondeterministic=os.getenv(
+            "LLM_CACHE_ALLOW_NONDETERMINISTIC", "false"
+        ).lower() in ("true", "1", "yes"),
+    )
@@ -0,0 +1,140 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+# 覆盖毫秒级缓存命中到分钟级 LLM 调用
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0,
+)
+
+STAGE_LATENCY = Histogram(
+    "video_search_stage_duration_seconds",
+    "Latency of each pipeline stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_ERRORS = Counter(
+    "video_search_stage_errors_total",
+    "Failed calls of each pipeline stage",
+    ["stage"],
+)
+STAGE_CANCELLED = Counter(
+    "video_search_stage_cancelled_total",
+    "Cancelled calls of each pipeline stage "
+    "(client disconnects, deadlines, shared calls)",
+    ["stage"],
+)
+LLM_TOKENS = Counter(
+    "video_search_llm_tokens_total",
+    "OpenAI tokens consumed",
+    ["operation", "kind"],
+)
+LLM_RETRIES = Counter(
+    "video_search_llm_retries_total",
+    "Retried OpenAI calls",
+    ["operation"],
+)
+YOUTUBE_QUOTA_UNITS = Counter(
+    "video_search_youtube_quota_units_total",
+    "YouTube Data API quota units consumed",
+    ["endpoint", "lane"],
+)
+SUBTITLE_TOKENS = Counter(
+    "video_search_subtitle_tokens_total",
+    "Estimated prompt tokens of ingested subtitles before and after preprocessing",
+    ["kind"],
+)
+
+
+@contextmanager
+def track_stage(stage: str) -> Iterator[None]:
+    """记录代码块的耗时，抛出异常时同时计入错误数
+
+    取消（客户端断开、请求合并或截止时间导致）单独计数，不计入错误数。
+
+    Args:
+        stage: 阶段名称，如 youtube_search_list、openai_analyze_subtitle
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except asyncio.CancelledError:
+        STAGE_CANCELLED.labels(stage).inc()
+        raise
+    except BaseException:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_LATENCY.labels(stage).observe(time.perf_counter() - start)
+
+
+def record_llm_usage(operation: str, usage: Any) -> None:
+    """记录 OpenAI 响应中的 token 用量
+
+    Args:
+        operation: 调用的 OpenAIClient 方法名
+        usage: 响应的 usage 字段，可能为None
+    """
+    if usage is None:
+        return
+    LLM_TOKENS.labels(operation, "prompt").inc(usage.prompt_tokens or 0)
+    LLM_TOKENS.labels(operation, "completion").inc(usage.completion_tokens or 0)
+
+
+def record_llm_retry(retry_state: Any) -> None:
+    """tenacity before_sleep 回调：记录一次重试"""
+    LLM_RETRIES.labels(retry_state.fn.__name__).inc()
+
+
+class StatsCollector(Collector):
+    """在抓取时读取各组件的 stats()，将会话、缓存等状态导出为指标
+
+    组件自身只维护计数器，不在热路径上操作 Prometheus 指标。
+    """
+
+    def __init__(self, sources: Dict[str, Callable[[], Dict]]):
+        """初始化收集器
+
+        Args:
+            sources: 组件名 -> 返回统计字典的函数，返回None的组件会被跳过
+        """
+        self.sources = sources
+
+    def collect(self) -> Iterator[Any]:
+        counters = CounterMetricFamily(
+            "video_search_component_events",
+            "Cumulative component counters such as cache hits and evictions",
+            labels=["component", "event"],
+        )
+        gauges = GaugeMetricFamily(
+            "video_search_component_state",
+            "Current component state such as entry counts and memory bytes",
+            labels=["component", "field"],
+        )
+        for component, source in self.sources.items():
+            stats = source()
+            if not stats:
+                continue
+            for field, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                if field in COUNTER_FIELDS:
+                    counters.add_metric([component, field], value)
+                else:
+                    gauges.add_metric([component, field], value)
+        yield counters
+        yield gauges
+
+
+# stats() 中单调递增的字段，其余数值字段按 gauge 导出
+COUNTER_FIELDS = frozenset({
+    "hits", "misses", "bypassed", "evictions", "evicted", "expired",
+    "trips", "rejected", "completed", "upserts", "unchanged", "searches", "restored",
+    "throttled", "stale_served",
+})
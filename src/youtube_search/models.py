@@ -6,7 +6,15 @@ from pydantic import BaseModel, Field
 class SearchRequest(BaseModel):
     """搜索请求"""
     keyword: str = Field(..., description="搜索关键词")
-    max_results: int = Field(default=3, ge=1, le=10, description="返回结果数量")
+    max_results: int = Field(
+        default=3, ge=1, le=200, description="返回结果数量，超过 50 时分页获取")
+    background: bool = Field(
+        default=False,
+        description="在后台生成总结，视频列表就绪后立即返回，"
+                    "通过 GET /sessions/{session_id} 查询进度")
+    wait_for_subtitles: bool = Field(
+        default=True,
+        description="后台模式下是否等待字幕获取完成再返回；为 false 时字幕也在后台获取")
 
 
 class VideoInfo(BaseModel):
@@ -26,6 +34,8 @@ class SearchSummary(BaseModel):
     """搜索结果总结"""
     total_videos: int
     overview: str
+    status: str = Field(
+        default="ready", description="总结状态：pending、ready 或 failed")
 
 
 class SearchResponse(BaseModel):
@@ -38,6 +48,37 @@ class SearchResponse(BaseModel):
     expires_at: datetime
 
 
+class BatchSearchRequest(BaseModel):
+    """批量搜索请求"""
+    keywords: List[str] = Field(
+        ..., min_length=1, max_length=50, description="搜索关键词列表")
+    max_results: int = Field(
+        default=3, ge=1, le=200, description="每个关键词的返回结果数量")
+    background: bool = Field(default=False, description="在后台生成各会话的总结")
+
+
+class BatchSearchResponse(BaseModel):
+    """批量搜索响应，每个关键词一个会话"""
+    results: List[SearchResponse]
+    unique_videos: int = Field(
+        ..., description="去重后的视频数，每个视频的元数据和字幕只获取一次")
+
+
+class VideoStatus(BaseModel):
+    """会话中单个视频的处理状态"""
+    video_id: str
+    status: str = Field(..., description="pending、ready、no_subtitles 或 failed")
+
+
+class SessionStatus(BaseModel):
+    """会话处理进度"""
+    session_id: str
+    keyword: str
+    status: str = Field(..., description="ingesting、summarizing、ready 或 failed")
+    summary: SearchSummary
+    videos: List[VideoStatus]
+
+
 class SessionAnalysisRequest(BaseModel):
     """会话内容分析请求"""
     session_id: str = Field(..., description="会话ID")
@@ -54,6 +95,23 @@ class VideoClip(BaseModel):
     url: str = Field(..., description="带时间戳的YouTube直达链接")
 
 
+class CorpusSegment(BaseModel):
+    """语料库检索命中的字幕片段"""
+    video_id: str = Field(..., description="视频ID")
+    video_title: str = Field(..., description="视频标题")
+    channel_title: str = Field(..., description="频道名称")
+    content: str = Field(..., description="字幕片段内容")
+    timestamp: str = Field(..., description="时间戳（MM:SS格式）")
+    score: float = Field(..., description="BM25 相关度得分，越大越相关")
+    url: str = Field(..., description="带时间戳的YouTube直达链接")
+
+
+class CorpusSearchResponse(BaseModel):
+    """语料库检索响应"""
+    query: str
+    segments: List[CorpusSegment] = Field(..., description="按相关度排序的字幕片段")
+
+
 class SessionAnalysisResponse(BaseModel):
     """会话内容分析响应"""
     clips: List[VideoClip] = Field(..., description="相关视频片段列表")
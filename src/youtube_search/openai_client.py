@@ -1,31 +1,168 @@
 import os
 import json
 import logging
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional, Tuple, Union
+import openai
 from openai import AsyncOpenAI
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import (
+    retry,
+    retry_if_not_exception_type,
+    stop_after_attempt,
+    wait_exponential,
+)
+
+from .llm_cache import LLMResponseCache
+from .metrics import record_llm_retry, record_llm_usage, track_stage
+from .preprocess import format_subtitle_line
+from .resilience import (
+    FAIL_FAST_ERRORS,
+    CircuitBreaker,
+    create_circuit_breaker,
+    stop_at_deadline,
+)
+from .singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+# 批量片段分析的结构化输出格式
+CLIPS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "video_clips",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "clips": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "video_id": {"type": "string"},
+                            "content": {"type": "string"},
+                            "timestamp": {"type": "string"},
+                            "relevance": {"type": "number"},
+                        },
+                        "required": ["video_id", "content", "timestamp", "relevance"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["clips"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """连接错误、超时、限流和 5xx 计入熔断，请求参数错误等不计入"""
+    return isinstance(error, (
+        openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError))
+
 
 class OpenAIClient:
     """OpenAI API 客户端"""
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        cache: Optional[LLMResponseCache] = None,
+        breaker: Optional[CircuitBreaker] = None
+    ):
         """初始化 OpenAI 客户端
 
         Args:
             api_key: OpenAI API key
+            cache: LLM 响应缓存，为None时不使用缓存
+            breaker: 熔断器，为None时按环境变量创建
         """
         self.api_key = api_key or os.getenv('OPENAI_API_KEY')
         if not self.api_key:
             raise ValueError("OpenAI API key is required")
 
-        # 初始化 OpenAI 客户端
+        # 初始化 OpenAI 客户端，重试由各方法的 tenacity 策略统一控制，
+        # 避免 SDK 内部重试叠加后超出请求的截止时间
         self.client = AsyncOpenAI(
             api_key=self.api_key,
-            timeout=30.0
+            timeout=30.0,
+            max_retries=0
         )
+        self.cache = cache
+        self.breaker = breaker or create_circuit_breaker(
+            "openai", is_failure=is_upstream_failure)
+        self._flights = SingleFlight()
+
+    def _cacheable_temperature(self) -> float:
+        """片段分析和总结的采样温度
+
+        启用缓存时使用 0，结果确定，相同请求可以直接复用缓存；回答仍使用默认温度。
+        """
+        return 0.0 if self.cache is not None else 0.7
+
+    async def _create_completion(
+        self,
+        operation: str,
+        messages: List[Dict],
+        max_tokens: int,
+        temperature: float = 0.7,
+        model: str = "gpt-4o",
+        response_format: Optional[Dict] = None
+    ) -> str:
+        """调用对话接口，相同请求优先从缓存返回，并发的相同请求合并为一次
+
+        Args:
+            operation: 调用方方法名，用于指标标签
+            messages: 对话消息列表
+            max_tokens: 最大返回token数
+            temperature: 采样温度
+            model: 模型名称
+            response_format: 结构化输出格式，如 JSON Schema
+
+        Returns:
+            str: 生成的文本
+        """
+        extra = {"response_format": response_format} if response_format else {}
+        key = LLMResponseCache.make_key(
+            model=model, messages=messages,
+            max_tokens=max_tokens, temperature=temperature, **extra)
+        with track_stage(f"openai_{operation}"):
+            return await self._flights.do(
+                key,
+                lambda: self._cached_completion(
+                    operation, key, messages, max_tokens, temperature, model, extra))
+
+    async def _cached_completion(
+        self,
+        operation: str,
+        key: str,
+        messages: List[Dict],
+        max_tokens: int,
+        temperature: float,
+        model: str,
+        extra: Dict
+    ) -> str:
+        """先查缓存，未命中时调用对话接口并写入缓存"""
+        cacheable = self.cache is not None and self.cache.is_cacheable(temperature)
+        if cacheable:
+            content = await self.cache.get(key)
+            if content is not None:
+                return content
+
+        response = await self.breaker.call(
+            lambda: self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                **extra
+            ))
+        record_llm_usage(operation, response.usage)
+        content = response.choices[0].message.content
+
+        if cacheable and content is not None:
+            await self.cache.set(key, content)
+        return content
 
     def _parse_json_response(self, content: str) -> Optional[Dict]:
         """解析可能包含 Markdown 代码块的 JSON 响应
@@ -65,14 +202,34 @@ class OpenAIClient:
         logger.error(f"Failed to parse response: {content}")
         return None
 
+    def _format_subtitles(self, subtitles: Union[str, List[Dict]]) -> str:
+        """构建字幕文本，保留时间信息
+
+        Args:
+            subtitles: 字幕列表，每项包含 text 和 start 时间；
+                已渲染的文本（如会话缓存的提示词文本）原样返回
+
+        Returns:
+            str: 每行形如 [MM:SS] 文本 的字幕内容
+        """
+        if isinstance(subtitles, str):
+            return subtitles
+        return "\n".join(
+            format_subtitle_line(item.get('start', 0), item.get('text', ''))
+            for item in subtitles
+        )
+
     @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10)
+        stop=stop_after_attempt(3) | stop_at_deadline,
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_not_exception_type(FAIL_FAST_ERRORS),
+        before_sleep=record_llm_retry,
+        reraise=True
     )
     async def analyze_subtitle(
         self,
         query: str,
-        subtitles: List[Dict],
+        subtitles: Union[str, List[Dict]],
         video_info: Dict,
         max_tokens: int = 500
     ) -> Dict:
@@ -80,23 +237,14 @@ class OpenAIClient:
 
         Args:
             query: 用户查询
-            subtitles: 字幕列表，每项包含 text 和 start 时间
+            subtitles: 字幕列表，每项包含 text 和 start 时间，或已渲染的 [MM:SS] 文本
             video_info: 视频信息，包含标题等
             max_tokens: 最大返回token数
 
         Returns:
             Dict: 分析结果，包含答案和相关片段
         """
-        # 构建字幕文本，保留时间信息
-        subtitle_entries = []
-        for item in subtitles:
-            start_time = int(item.get('start', 0))
-            minutes = start_time // 60
-            seconds = start_time % 60
-            time_str = f"{minutes:02d}:{seconds:02d}"
-            subtitle_entries.append(f"[{time_str}] {item.get('text', '')}")
-
-        subtitle_text = "\n".join(subtitle_entries)
+        subtitle_text = self._format_subtitles(subtitles)
 
         system_prompt = """
         你是一个视频内容分析助手。你的任务是：
@@ -128,90 +276,152 @@ class OpenAIClient:
         """
 
         try:
-            response = await self.client.chat.completions.create(
-                model="gpt-4o",
+            content = await self._create_completion(
+                "analyze_subtitle",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
                 max_tokens=max_tokens,
-                temperature=0.7
+                temperature=self._cacheable_temperature()
             )
 
-            return self._parse_json_response(response.choices[0].message.content)
+            return self._parse_json_response(content)
 
         except Exception as e:
             logger.error(f"OpenAI API error: {str(e)}")
             raise
 
     @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10)
+        stop=stop_after_attempt(3) | stop_at_deadline,
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_not_exception_type(FAIL_FAST_ERRORS),
+        before_sleep=record_llm_retry,
+        reraise=True
     )
-    async def generate_video_sumary(
+    async def analyze_subtitles_batch(
         self,
-        transcript: str,
-        max_tokens: int = 300
-    ) -> str:
-        """总结字幕内容
+        query: str,
+        videos: List[Tuple[Dict, Union[str, List[Dict]]]],
+        max_clips_per_video: int = 3,
+        max_tokens: int = 1500
+    ) -> Dict[str, List[Dict]]:
+        """在一次请求中分析多个视频的字幕，每个视频返回多个按相关度排序的片段
+
+        使用 JSON Schema 结构化输出，无需从 Markdown 中解析 JSON。
 
         Args:
-            transcript: 字幕文本内容
+            query: 用户查询
+            videos: (视频信息, 字幕列表或已渲染的 [MM:SS] 文本) 列表，
+                字幕应已按检索结果裁剪
+            max_clips_per_video: 每个视频最多返回的片段数
             max_tokens: 最大返回token数
 
         Returns:
-            str: 内容总结
+            Dict[str, List[Dict]]: video_id -> 片段列表，每个片段包含
+                content、timestamp 和 relevance，按相关度从高到低排序
         """
-        system_prompt = """
+        system_prompt = f"""
         你是一个视频内容分析助手。你的任务是：
-        1. 分析字幕内容
-        2. 生成简洁的内容总结
-        3. 总结要点到点，不要太啰嗦
+        1. 分析用户的问题和多个视频的字幕内容
+        2. 在每个视频中找出与问题最相关的内容，每个视频最多 {max_clips_per_video} 个片段
+        3. 为每个片段标注视频ID、时间点和相关度
+
+        要求：
+        - video_id 必须是字幕内容中给出的视频ID
+        - timestamp 为 MM:SS 格式的时间点，取自对应字幕行
+        - relevance 为 0.0 到 1.0 的相关度
+        - 与问题无关的视频不要返回片段
         """
 
+        sections = []
+        for video_info, subtitles in videos:
+            sections.append(
+                f"视频ID: {video_info['video_id']}\n"
+                f"视频标题: {video_info.get('title', '')}\n"
+                f"字幕内容:\n{self._format_subtitles(subtitles)}"
+            )
+        sections_text = "\n\n".join(sections)
+
         user_prompt = f"""
-        字幕内容:
-        {transcript}
-        
-        请生成一个简洁的总结。
+        用户问题: {query}
+
+        {sections_text}
+
+        请分析每个视频的字幕内容，找出与用户问题最相关的片段，并标注具体时间点。
         """
 
         try:
-            response = await self.client.chat.completions.create(
-                model="gpt-4o",
+            content = await self._create_completion(
+                "analyze_subtitles_batch",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
                 max_tokens=max_tokens,
-                temperature=0.7
+                temperature=0.0,
+                response_format=CLIPS_RESPONSE_FORMAT
             )
 
-            return response.choices[0].message.content.strip()
-
         except Exception as e:
             logger.error(f"OpenAI API error: {str(e)}")
             raise
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10)
-    )
-    async def answer_question(
-        self,
-        query: str,
-        transcript: str,
-        max_tokens: int = 800
-    ) -> str:
-        """基于字幕内容和 LLM 知识回答用户问题
+        try:
+            clips = json.loads(content)["clips"]
+        except (TypeError, KeyError, json.JSONDecodeError) as e:
+            logger.error(f"Failed to parse batch analysis response: {e}")
+            return {}
+
+        video_ids = {video_info["video_id"] for video_info, _ in videos}
+        results: Dict[str, List[Dict]] = {}
+        for clip in sorted(clips, key=lambda c: c["relevance"], reverse=True):
+            video_clips = results.setdefault(clip["video_id"], [])
+            if clip["video_id"] in video_ids and len(video_clips) < max_clips_per_video:
+                video_clips.append({
+                    "content": clip["content"],
+                    "timestamp": clip["timestamp"],
+                    "relevance": min(max(float(clip["relevance"]), 0.0), 1.0),
+                })
+        return {video_id: clips for video_id, clips in results.items() if clips}
+
+    def _summary_messages(self, transcript: str) -> List[Dict]:
+        """构建字幕总结的对话消息
+
+        Args:
+            transcript: 字幕文本内容
+
+        Returns:
+            List[Dict]: OpenAI 对话消息列表
+        """
+        system_prompt = """
+        你是一个视频内容分析助手。你的任务是：
+        1. 分析字幕内容
+        2. 生成简洁的内容总结
+        3. 总结要点到点，不要太啰嗦
+        """
+
+        user_prompt = f"""
+        字幕内容:
+        {transcript}
+        
+        请生成一个简洁的总结。
+        """
+
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _answer_messages(self, query: str, transcript: str) -> List[Dict]:
+        """构建问题回答的对话消息
 
         Args:
             query: 用户问题
             transcript: 字幕文本内容
-            max_tokens: 最大返回token数
 
         Returns:
-            str: 问题的回答
+            List[Dict]: OpenAI 对话消息列表
         """
         system_prompt = """
         你是一个专业的视频内容分析助手。你的任务是：
@@ -244,19 +454,183 @@ class OpenAIClient:
         请先基于字幕内容回答问题，再结合你的知识进行补充和扩展。
         """
 
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    async def _stream_completion(
+        self,
+        operation: str,
+        messages: List[Dict],
+        max_tokens: int,
+        temperature: float = 0.7
+    ) -> AsyncIterator[str]:
+        """以流式方式调用对话接口，逐段返回生成的文本
+
+        Args:
+            operation: 调用方方法名，用于指标标签
+            messages: 对话消息列表
+            max_tokens: 最大返回token数
+            temperature: 采样温度
+
+        Yields:
+            str: 新生成的文本片段，缓存命中时一次返回完整内容
+        """
+        model = "gpt-4o"
+        key = None
+        if self.cache and self.cache.is_cacheable(temperature):
+            key = self.cache.make_key(
+                model=model, messages=messages,
+                max_tokens=max_tokens, temperature=temperature)
+            content = await self.cache.get(key)
+            if content is not None:
+                yield content
+                return
+
+        # 流式调用只统计到开始返回的耗时，不含调用方消费片段的时间
+        with track_stage(f"openai_{operation}"):
+            stream = await self.breaker.call(
+                lambda: self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                ))
+        parts = []
+        async for chunk in stream:
+            if chunk.usage is not None:
+                record_llm_usage(operation, chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+
+        if key is not None:
+            await self.cache.set(key, "".join(parts))
+
+    async def stream_video_summary(
+        self,
+        transcript: str,
+        max_tokens: int = 300
+    ) -> AsyncIterator[str]:
+        """流式总结字幕内容
+
+        Args:
+            transcript: 字幕文本内容
+            max_tokens: 最大返回token数
+
+        Yields:
+            str: 总结的文本片段
+        """
+        async for delta in self._stream_completion(
+                "stream_video_summary", self._summary_messages(transcript), max_tokens,
+                temperature=self._cacheable_temperature()):
+            yield delta
+
+    async def stream_answer(
+        self,
+        query: str,
+        transcript: str,
+        max_tokens: int = 800
+    ) -> AsyncIterator[str]:
+        """流式回答用户问题，出错时返回与 answer_question 相同的提示，
+        熔断器打开或请求截止时间已过时直接抛出异常
+
+        Args:
+            query: 用户问题
+            transcript: 字幕文本内容
+            max_tokens: 最大返回token数
+
+        Yields:
+            str: 回答的文本片段
+        """
         try:
-            response = await self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
+            async for delta in self._stream_completion(
+                    "stream_answer",
+                    self._answer_messages(query, transcript),
+                    max_tokens):
+                yield delta
+        except FAIL_FAST_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"OpenAI API error: {str(e)}")
+            yield "抱歉，在处理您的问题时遇到了错误。"
+
+    @retry(
+        stop=stop_after_attempt(3) | stop_at_deadline,
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_not_exception_type(FAIL_FAST_ERRORS),
+        before_sleep=record_llm_retry,
+        reraise=True
+    )
+    async def generate_video_sumary(
+        self,
+        transcript: str,
+        max_tokens: int = 300
+    ) -> str:
+        """总结字幕内容
+
+        Args:
+            transcript: 字幕文本内容
+            max_tokens: 最大返回token数
+
+        Returns:
+            str: 内容总结
+        """
+        try:
+            content = await self._create_completion(
+                "generate_video_sumary",
+                messages=self._summary_messages(transcript),
                 max_tokens=max_tokens,
-                temperature=0.7
+                temperature=self._cacheable_temperature()
+            )
+
+            return content.strip()
+
+        except Exception as e:
+            logger.error(f"OpenAI API error: {str(e)}")
+            raise
+
+    @retry(
+        stop=stop_after_attempt(3) | stop_at_deadline,
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_not_exception_type(FAIL_FAST_ERRORS),
+        before_sleep=record_llm_retry,
+        reraise=True
+    )
+    async def answer_question(
+        self,
+        query: str,
+        transcript: str,
+        max_tokens: int = 800
+    ) -> str:
+        """基于字幕内容和 LLM 知识回答用户问题
+
+        Args:
+            query: 用户问题
+            transcript: 字幕文本内容
+            max_tokens: 最大返回token数
+
+        Returns:
+            str: 问题的回答，出错时返回提示信息
+
+        Raises:
+            CircuitOpenError: OpenAI 熔断器打开
+            DeadlineExceeded: 请求截止时间已过
+        """
+        try:
+            content = await self._create_completion(
+                "answer_question",
+                messages=self._answer_messages(query, transcript),
+                max_tokens=max_tokens
             )
 
-            return response.choices[0].message.content.strip()
+            return content.strip()
 
+        except FAIL_FAST_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"OpenAI API error: {str(e)}")
             return "抱歉，在处理您的问题时遇到了错误。"
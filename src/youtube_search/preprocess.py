@@ -0,0 +1,206 @@
+import re
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+from .search_index import CJK_PATTERN
+
+# 常见的音效标注词，括号内只有这些词时视为音效标注，如 [Music]、(笑)、【音乐】
+_SOUND_TAGS = (
+    "music", "music playing", "background music", "applause", "laughter", "laughs",
+    "laughing", "cheering", "cheers", "silence", "noise", "inaudible", "sighs", "♪+",
+    "音乐", "音樂", "背景音乐", "笑", "笑声", "大笑", "掌声", "鼓掌", "欢呼",
+    "音楽", "拍手", "笑い",
+)
+_SOUND_TAG_PATTERN = re.compile(
+    r"[\[(（【]\s*(?:" + "|".join(_SOUND_TAGS) + r")\s*[\])）】]",
+    re.IGNORECASE,
+)
+# 整行只有一个括号标注时，无论内容都视为音效或说话人标注，如 [crowd murmuring]
+_TAG_LINE_PATTERN = re.compile(r"^\s*[\[(（【][^\])）】]{1,40}[\])）】]\s*$")
+# 口头填充词；只包含不会与正常用词混淆的词
+_FILLER_PATTERN = re.compile(
+    r"(?<![\w'])(?:u+m+|u+h+|uhm|e+r+m+|h+m+)(?![\w'])[,，]?|[嗯呃]+[,，]?",
+    re.IGNORECASE,
+)
+# 中日韩标点和全角字符，前后都不加空格
+_CJK_PUNCT = r"\u3000-\u303f\uff00-\uffef"
+_CJK_PUNCT_PATTERN = re.compile(rf"[{_CJK_PUNCT}]")
+# 单个中日韩文字或标点，或一段连续的其他非空白字符
+_PIECE_PATTERN = re.compile(
+    rf"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af{_CJK_PUNCT}]"
+    rf"|[^\s\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af{_CJK_PUNCT}]+"
+)
+_SENTENCE_END_PATTERN = re.compile(r"[.!?。！？…]$")
+# 判断滚动字幕重叠时向前比较的最大词数
+_OVERLAP_LOOKBACK = 40
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的 token 数
+
+    中日韩文字约每字 1 个 token，其余字符约每 4 个字符 1 个 token。
+
+    Args:
+        text: 文本
+
+    Returns:
+        int: 估算的 token 数
+    """
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def format_subtitle_line(start: float, text: str) -> str:
+    """将一行字幕渲染为提示词中的 [MM:SS] 文本 格式"""
+    start_time = int(start)
+    return f"[{start_time // 60:02d}:{start_time % 60:02d}] {text}"
+
+
+def clean_text(text: str) -> str:
+    """去除音效标注和口头填充词，合并多余空白
+
+    行内只去除已知的音效标注词，其余括号内容（如代码、注释）保留。
+    """
+    if _TAG_LINE_PATTERN.match(text):
+        return ""
+    text = _SOUND_TAG_PATTERN.sub(" ", text)
+    text = _FILLER_PATTERN.sub(" ", text)
+    return " ".join(text.split())
+
+
+def _split(text: str) -> List[str]:
+    return _PIECE_PATTERN.findall(text)
+
+
+def _needs_space(left: str, right: str) -> bool:
+    """相邻两个词片段之间是否加空格
+
+    中日韩文字之间、中日韩标点前后以及中日韩文字与相邻数字之间不加空格。
+    """
+    if _CJK_PUNCT_PATTERN.match(left) or _CJK_PUNCT_PATTERN.match(right):
+        return False
+    left_cjk = bool(CJK_PATTERN.match(left))
+    right_cjk = bool(CJK_PATTERN.match(right))
+    if left_cjk and right_cjk:
+        return False
+    if left_cjk and right[0].isdigit() or right_cjk and left[-1].isdigit():
+        return False
+    return True
+
+
+def _join(pieces: Sequence[str]) -> str:
+    """拼接词片段，只在西文词之间加空格"""
+    parts: List[str] = []
+    for piece in pieces:
+        if parts and _needs_space(parts[-1], piece):
+            parts.append(" ")
+        parts.append(piece)
+    return "".join(parts)
+
+
+def _overlap(previous: Sequence[str], current: Sequence[str]) -> int:
+    """计算 current 开头与 previous 结尾重复的词数
+
+    滚动字幕中每行通常以上一行的结尾开头。为避免误删正常的重复用词，
+    重叠至少三个词，或 current 整行都包含在 previous 结尾中。
+    """
+    tail = previous[-_OVERLAP_LOOKBACK:]
+    for size in range(min(len(tail), len(current)), 0, -1):
+        if tail[len(tail) - size:] == list(current[:size]):
+            if size >= 3 or size == len(current):
+                return size
+            break
+    return 0
+
+
+class PreprocessStats(NamedTuple):
+    """字幕预处理前后的规模"""
+    raw_lines: int
+    lines: int
+    raw_tokens: int
+    tokens: int
+
+    @property
+    def saved_ratio(self) -> float:
+        """节省的 token 比例"""
+        return 1 - self.tokens / self.raw_tokens if self.raw_tokens else 0.0
+
+
+def merge_segments(
+    subtitles: Sequence[Dict],
+    max_seconds: float = 20.0,
+    min_seconds: float = 5.0,
+    max_gap: float = 2.0,
+) -> List[Dict]:
+    """将细碎的字幕合并为句子或段落级的片段，并去除滚动字幕的重复和填充词
+
+    片段在句末标点处（且已满 min_seconds）、时长达到 max_seconds
+    或相邻字幕间隔超过 max_gap 时结束。
+
+    Args:
+        subtitles: 按开始时间排序的字幕列表，每项包含 text、start 和 duration
+        max_seconds: 单个片段的最大时长（秒）
+        min_seconds: 在句末标点处结束片段所需的最小时长（秒）
+        max_gap: 相邻字幕之间允许合并的最大间隔（秒）
+
+    Returns:
+        List[Dict]: 与输入格式相同的片段列表
+    """
+    segments: List[Dict] = []
+    pieces: List[str] = []
+    previous: List[str] = []
+    start = end = 0.0
+
+    def flush() -> None:
+        if pieces:
+            segments.append(
+                {"text": _join(pieces), "start": start, "duration": end - start})
+            pieces.clear()
+
+    for sub in subtitles:
+        sub_start = float(sub.get("start", 0))
+        sub_end = sub_start + float(sub.get("duration", 0))
+        current = _split(clean_text(sub.get("text", "")))
+        # 与上一行而不是当前片段比较，滚动字幕的重叠可能跨越片段边界
+        new = current[_overlap(previous, current):]
+        previous = (previous + new)[-_OVERLAP_LOOKBACK:]
+        if not new:
+            if pieces:
+                end = max(end, sub_end)
+            continue
+
+        if pieces and (sub_start - end > max_gap or sub_end - start > max_seconds):
+            flush()
+        if not pieces:
+            start, end = sub_start, sub_end
+        pieces.extend(new)
+        end = max(end, sub_end)
+
+        if end - start >= min_seconds and _SENTENCE_END_PATTERN.search(new[-1]):
+            flush()
+    flush()
+    return segments
+
+
+def preprocess_subtitles(
+    subtitles: Sequence[Dict],
+    max_seconds: float = 20.0,
+) -> Tuple[List[Dict], PreprocessStats]:
+    """字幕入库前的预处理，返回合并后的片段及前后 token 估算
+
+    Args:
+        subtitles: 原始字幕列表
+        max_seconds: 单个片段的最大时长（秒）
+
+    Returns:
+        Tuple[List[Dict], PreprocessStats]: 片段列表和预处理统计
+    """
+    ordered = sorted(subtitles, key=lambda sub: sub.get("start", 0))
+    segments = merge_segments(ordered, max_seconds=max_seconds)
+    raw_tokens = sum(
+        estimate_tokens(
+            format_subtitle_line(sub.get("start", 0), sub.get("text", ""))) + 1
+        for sub in ordered)
+    tokens = sum(
+        estimate_tokens(format_subtitle_line(seg["start"], seg["text"])) + 1
+        for seg in segments)
+    return segments, PreprocessStats(len(ordered), len(segments), raw_tokens, tokens)
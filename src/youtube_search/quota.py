@@ -0,0 +1,288 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from .metrics import YOUTUBE_QUOTA_UNITS
+from .resilience import CircuitOpenError, remaining_time
+
+logger = logging.getLogger(__name__)
+
+# YouTube Data API 各接口每次调用消耗的配额单位
+QUOTA_COSTS = {"search": 100, "videos": 1}
+
+# 优先级从高到低：interactive 为用户直接发起的搜索，batch 为批量搜索
+LANES = ("interactive", "batch")
+
+_lane: ContextVar[str] = ContextVar("quota_lane", default="interactive")
+# 低优先级调用让出令牌后重新检查的间隔（秒）
+_YIELD_INTERVAL = 0.05
+# 已用配额写入状态文件的最短间隔（秒），配额耗尽和关闭时立即写入
+_SAVE_INTERVAL = 1.0
+
+
+class QuotaExceededError(CircuitOpenError):
+    """YouTube Data API 配额不足，调用被拒绝"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("youtube_quota", retry_after)
+
+
+@contextmanager
+def quota_lane(lane: str) -> Iterator[None]:
+    """为代码块中的 YouTube Data API 调用设置优先级通道
+
+    Args:
+        lane: LANES 中的通道名称
+    """
+    if lane not in LANES:
+        raise ValueError(f"Unknown quota lane: {lane}")
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+class QuotaScheduler:
+    """YouTube Data API 配额调度器
+
+    按天统计消耗的配额单位，并用令牌桶平滑消耗速度。低优先级通道不能使用为
+    interactive 通道预留的配额，令牌不足时也要等待排队中的高优先级调用先完成。
+
+    配置状态文件时，当天已用配额在重启后恢复；多个进程不能共用同一个状态文件。
+    """
+
+    def __init__(
+        self,
+        daily_units: int = 10000,
+        rate: float = 1.0,
+        burst: float = 1000.0,
+        reserve_ratio: float = 0.2,
+        low_ratio: float = 0.1,
+        max_wait: float = 10.0,
+        reset_hour: int = 8,
+        state_path: Optional[str] = None,
+    ):
+        """初始化配额调度器
+
+        Args:
+            daily_units: 每天的配额单位
+            rate: 令牌桶每秒补充的配额单位，为0时不限速
+            burst: 令牌桶容量
+            reserve_ratio: 为 interactive 通道预留的每日配额比例
+            low_ratio: 剩余配额低于该比例时视为配额紧张，优先使用过期缓存
+            max_wait: 令牌不足时最长等待时间（秒），同时受请求截止时间约束
+            reset_hour: 配额重置的 UTC 小时，YouTube 在太平洋时间零点重置
+            state_path: 保存当天已用配额的 JSON 文件路径，为None时只在内存中统计
+        """
+        self.daily_units = daily_units
+        self.rate = rate
+        self.burst = burst
+        self.reserve_ratio = reserve_ratio
+        self.low_ratio = low_ratio
+        self.max_wait = max_wait
+        self.reset_hour = reset_hour
+        self.used_units = 0
+        self.tokens = burst
+        self.throttled = 0
+        self.rejected = 0
+        self.stale_served = 0
+        self._day = self._current_day()
+        self._refilled_at = time.monotonic()
+        self._waiting = [0] * len(LANES)
+        self.state_path = state_path
+        self._saved_at = 0.0
+        self._saved_units = 0
+        if state_path:
+            self._load_state()
+
+    def _load_state(self) -> None:
+        """从状态文件恢复当天已用配额，文件属于之前的配额日时忽略"""
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            day, used_units = int(state["day"]), int(state["used_units"])
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Failed to load quota state from {self.state_path}: {e}")
+            return
+        if day == self._day:
+            self.used_units = self._saved_units = used_units
+            logger.info(f"Restored {used_units} used YouTube quota units "
+                        f"from {self.state_path}")
+
+    def save_state(self, force: bool = True) -> None:
+        """将当天已用配额写入状态文件
+
+        Args:
+            force: 为False时距上次写入不足 _SAVE_INTERVAL 秒则跳过
+        """
+        if not self.state_path or self.used_units == self._saved_units:
+            return
+        now = time.monotonic()
+        if not force and now - self._saved_at < _SAVE_INTERVAL:
+            return
+        self._saved_at = now
+        try:
+            directory = os.path.dirname(self.state_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{self.state_path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"day": self._day, "used_units": self.used_units}, f)
+            os.replace(temp_path, self.state_path)
+            self._saved_units = self.used_units
+        except OSError as e:
+            logger.warning(f"Failed to save quota state to {self.state_path}: {e}")
+
+    def _current_day(self) -> int:
+        return int((time.time() - self.reset_hour * 3600) // 86400)
+
+    def _roll_over(self) -> None:
+        """跨过重置时间后清零已用配额"""
+        day = self._current_day()
+        if day != self._day:
+            self._day = day
+            self.used_units = 0
+            self._saved_units = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            self.burst, self.tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def seconds_until_reset(self) -> float:
+        """距离下次配额重置的秒数"""
+        return (self._current_day() + 1) * 86400 + self.reset_hour * 3600 - time.time()
+
+    def remaining_units(self, lane: Optional[str] = None) -> int:
+        """通道可用的剩余配额单位
+
+        Args:
+            lane: 通道名称，为None时使用当前上下文的通道
+
+        Returns:
+            int: 剩余配额单位，低优先级通道扣除为 interactive 预留的部分
+        """
+        self._roll_over()
+        remaining = self.daily_units - self.used_units
+        if (lane or _lane.get()) != LANES[0]:
+            remaining -= int(self.daily_units * self.reserve_ratio)
+        return max(0, remaining)
+
+    def is_low(self) -> bool:
+        """当前通道的剩余配额是否紧张"""
+        return self.remaining_units() < self.daily_units * self.low_ratio
+
+    def exhaust(self) -> None:
+        """API 返回配额耗尽时调用，当天剩余时间内不再发起调用"""
+        self._roll_over()
+        if self.used_units < self.daily_units:
+            logger.warning(
+                f"YouTube quota exhausted upstream after {self.used_units} local units")
+        self.used_units = self.daily_units
+        self.save_state()
+
+    async def acquire(self, cost: int, endpoint: str = "") -> None:
+        """为一次 API 调用申请配额，令牌不足时等待
+
+        Args:
+            cost: 调用消耗的配额单位
+            endpoint: 接口名称，用于指标
+
+        Raises:
+            QuotaExceededError: 当日配额不足，或等待时间超过上限或请求剩余时间
+        """
+        lane = _lane.get()
+        priority = LANES.index(lane)
+        deadline = time.monotonic() + self.max_wait
+        throttled = False
+        while True:
+            if cost > self.remaining_units(lane):
+                self.rejected += 1
+                raise QuotaExceededError(self.seconds_until_reset())
+            if self.rate <= 0:
+                break
+            self._refill()
+            # 单次消耗超过桶容量时只要求桶满，不足部分以负余额计
+            need = min(cost, self.burst)
+            if self.tokens < need:
+                wait = (need - self.tokens) / self.rate
+            elif any(self._waiting[:priority]):
+                # 令牌足够但有高优先级调用在排队，稍后再检查
+                wait = _YIELD_INTERVAL
+            else:
+                break
+
+            limit = deadline - time.monotonic()
+            remaining = remaining_time()
+            if remaining is not None:
+                limit = min(limit, remaining)
+            if wait > limit:
+                self.rejected += 1
+                raise QuotaExceededError(wait)
+            if not throttled:
+                throttled = True
+                self.throttled += 1
+            self._waiting[priority] += 1
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._waiting[priority] -= 1
+
+        if self.rate > 0:
+            self.tokens -= cost
+        self.used_units += cost
+        YOUTUBE_QUOTA_UNITS.labels(endpoint, lane).inc(cost)
+        self.save_state(force=False)
+
+    def stats(self) -> Dict:
+        """获取配额统计信息"""
+        return {
+            "daily_units": self.daily_units,
+            "used_units": self.used_units,
+            "remaining_units": self.remaining_units(LANES[0]),
+            "tokens": round(self.tokens, 2),
+            "waiting": sum(self._waiting),
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+            "stale_served": self.stale_served,
+        }
+
+
+def create_quota_scheduler() -> Optional[QuotaScheduler]:
+    """根据环境变量创建配额调度器
+
+    环境变量:
+        YOUTUBE_QUOTA_DAILY_UNITS: 每天的配额单位，为0时关闭调度
+        YOUTUBE_QUOTA_RATE: 令牌桶每秒补充的配额单位
+        YOUTUBE_QUOTA_BURST: 令牌桶容量
+        YOUTUBE_QUOTA_RESERVE: 为 interactive 通道预留的每日配额比例
+        YOUTUBE_QUOTA_LOW: 视为配额紧张的剩余比例
+        YOUTUBE_QUOTA_MAX_WAIT: 令牌不足时最长等待时间（秒）
+        YOUTUBE_QUOTA_RESET_HOUR: 配额重置的 UTC 小时
+        YOUTUBE_QUOTA_STATE_PATH: 保存当天已用配额的文件路径，为空时只在内存中统计
+
+    Returns:
+        Optional[QuotaScheduler]: 配额调度器，关闭时返回None
+    """
+    daily_units = int(os.getenv("YOUTUBE_QUOTA_DAILY_UNITS", 10000))
+    if daily_units <= 0:
+        return None
+    return QuotaScheduler(
+        daily_units=daily_units,
+        rate=float(os.getenv("YOUTUBE_QUOTA_RATE", 1.0)),
+        burst=float(os.getenv("YOUTUBE_QUOTA_BURST", 1000)),
+        reserve_ratio=float(os.getenv("YOUTUBE_QUOTA_RESERVE", 0.2)),
+        low_ratio=float(os.getenv("YOUTUBE_QUOTA_LOW", 0.1)),
+        max_wait=float(os.getenv("YOUTUBE_QUOTA_MAX_WAIT", 10)),
+        reset_hour=int(os.getenv("YOUTUBE_QUOTA_RESET_HOUR", 8)),
+        state_path=os.getenv("YOUTUBE_QUOTA_STATE_PATH", ".cache/quota.json") or None,
+    )
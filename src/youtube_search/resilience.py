@@ -0,0 +1,244 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 当前请求的截止时间（time.monotonic()），随 contextvars 传递到子任务
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """请求的时间预算已耗尽"""
+
+
+class CircuitOpenError(Exception):
+    """上游熔断器处于打开状态，调用被直接拒绝"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable, retry after {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+# 不应重试的错误：重试只会继续占用已耗尽的预算或打到已熔断的上游
+FAIL_FAST_ERRORS = (CircuitOpenError, DeadlineExceeded)
+
+
+@contextmanager
+def request_deadline(seconds: Optional[float]) -> Iterator[None]:
+    """为代码块设置截止时间，嵌套时取更早的截止时间
+
+    Args:
+        seconds: 时间预算（秒），为None时不设置
+    """
+    if seconds is None:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def detached_deadline(seconds: Optional[float]) -> Iterator[None]:
+    """为后台任务设置独立的截止时间
+
+    后台任务会继承发起请求的上下文，这里替换而不是收紧继承来的截止时间，
+    使任务不受已返回请求的时间预算约束。
+
+    Args:
+        seconds: 时间预算（秒），为None时不设置
+    """
+    token = _deadline.set(None if seconds is None else time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """当前请求剩余的时间（秒），未设置截止时间时返回None"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def deadline_timeout(default: Optional[float] = None) -> Optional[float]:
+    """计算受截止时间约束的超时时间
+
+    Args:
+        default: 调用自身的超时时间（秒）
+
+    Returns:
+        Optional[float]: default 与剩余时间中较小者，两者都没有时返回None
+
+    Raises:
+        DeadlineExceeded: 截止时间已过
+    """
+    remaining = remaining_time()
+    if remaining is None:
+        return default
+    if remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return remaining if default is None else min(default, remaining)
+
+
+def stop_at_deadline(retry_state: Any) -> bool:
+    """tenacity 停止条件：剩余时间不足以完成下一次退避等待时停止重试"""
+    remaining = remaining_time()
+    return remaining is not None and remaining <= (retry_state.upcoming_sleep or 0)
+
+
+class CircuitBreaker:
+    """上游熔断器
+
+    连续失败达到阈值后打开，在恢复时间内直接拒绝调用；恢复时间过后进入半开状态，
+    只放行一个试探调用，成功则关闭，失败则重新打开。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        is_failure: Optional[Callable[[BaseException], bool]] = None,
+    ):
+        """初始化熔断器
+
+        Args:
+            name: 上游名称，用于日志和错误信息
+            failure_threshold: 打开熔断器所需的连续失败次数
+            recovery_timeout: 打开后到允许试探调用的时间（秒）
+            is_failure: 判断异常是否表示上游故障，为None时所有异常都计为失败；
+                如视频无字幕等业务错误不应计入
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.is_failure = is_failure or (lambda e: True)
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def _before_call(self) -> bool:
+        """检查是否放行调用，返回本次调用是否为半开状态的试探调用"""
+        if self.state == self.OPEN:
+            elapsed = time.monotonic() - self._opened_at
+            if elapsed < self.recovery_timeout:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self.recovery_timeout - elapsed)
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self.recovery_timeout)
+            self._probing = True
+            return True
+        return False
+
+    def _on_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info(f"Circuit {self.name} closed")
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def _on_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+                logger.warning(
+                    f"Circuit {self.name} opened after {self.failures} failures")
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """在熔断器保护和请求截止时间内执行上游调用
+
+        Args:
+            fn: 无参数的协程函数
+
+        Returns:
+            T: fn 的返回值
+
+        Raises:
+            CircuitOpenError: 熔断器打开
+            DeadlineExceeded: 调用前或调用中截止时间已过
+        """
+        probe = self._before_call()
+        try:
+            timeout = deadline_timeout()
+            if timeout is None:
+                result = await fn()
+            else:
+                try:
+                    result = await asyncio.wait_for(fn(), timeout)
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded(
+                        f"Request deadline exceeded while calling {self.name}"
+                    ) from None
+        except DeadlineExceeded:
+            # 预算耗尽不代表上游故障
+            raise
+        except Exception as e:
+            if self.is_failure(e):
+                self._on_failure()
+            raise
+        else:
+            self._on_success()
+            return result
+        finally:
+            if probe:
+                self._probing = False
+
+    def stats(self) -> Dict:
+        """获取熔断器统计信息"""
+        return {
+            "state": self.state,
+            "open": int(self.state != self.CLOSED),
+            "failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+def create_circuit_breaker(
+    name: str,
+    is_failure: Optional[Callable[[BaseException], bool]] = None,
+) -> CircuitBreaker:
+    """根据环境变量创建熔断器
+
+    环境变量:
+        CIRCUIT_FAILURE_THRESHOLD: 打开熔断器所需的连续失败次数
+        CIRCUIT_RECOVERY_TIMEOUT: 打开后到允许试探调用的时间（秒）
+
+    Args:
+        name: 上游名称
+        is_failure: 判断异常是否表示上游故障
+
+    Returns:
+        CircuitBreaker: 熔断器实例
+    """
+    return CircuitBreaker(
+        name,
+        failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5)),
+        recovery_timeout=float(os.getenv("CIRCUIT_RECOVERY_TIMEOUT", 30)),
+        is_failure=is_failure,
+    )
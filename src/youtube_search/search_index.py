@@ -0,0 +1,192 @@
+import math
+import re
+import sys
+from collections import Counter, defaultdict
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+from .transcript import CompactTranscript
+
+# CJK 统一表意文字、日文假名、韩文音节按字切分，其余按单词切分
+_TOKEN_PATTERN = re.compile(
+    r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]+|[0-9a-zA-ZÀ-ɏ]+"
+)
+CJK_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]")
+
+
+def tokenize(text: str) -> List[str]:
+    """将文本切分为检索词，支持中日韩文字
+
+    拉丁文字按单词切分并转为小写；中日韩文字没有空格分隔，
+    按单字和相邻两字（bigram）切分。
+
+    Args:
+        text: 待切分的文本
+
+    Returns:
+        List[str]: 检索词列表
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text.lower()):
+        word = match.group()
+        if CJK_PATTERN.match(word):
+            tokens.extend(word)
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+class SubtitleWindow(NamedTuple):
+    """按时间划分的字幕窗口，[begin, end) 为字幕列表中的下标范围"""
+    video_id: str
+    begin: int
+    end: int
+    start: float
+
+
+def build_windows(
+    video_id: str,
+    transcript: CompactTranscript,
+    window_seconds: float = 60.0,
+) -> List[SubtitleWindow]:
+    """将字幕按固定时长切分为窗口
+
+    Args:
+        video_id: 视频ID
+        transcript: 列式字幕
+        window_seconds: 每个窗口的时长（秒）
+
+    Returns:
+        List[SubtitleWindow]: 字幕窗口列表
+    """
+    windows = []
+    starts = transcript.starts
+    begin = 0
+    while begin < len(starts):
+        end = max(
+            transcript.index_range(starts[begin] + window_seconds, float("inf"))[0],
+            begin + 1)
+        windows.append(SubtitleWindow(
+            video_id=video_id,
+            begin=begin,
+            end=end,
+            start=starts[begin],
+        ))
+        begin = end
+    return windows
+
+
+def window_text(transcript: CompactTranscript, window: SubtitleWindow) -> str:
+    """拼接窗口内的字幕文本
+
+    Args:
+        transcript: 窗口所属视频的列式字幕
+        window: 字幕窗口
+
+    Returns:
+        str: 窗口文本
+    """
+    return transcript.join_text(window.begin, window.end)
+
+
+class BM25Index:
+    """基于 BM25 的字幕窗口倒排索引"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """初始化索引
+
+        Args:
+            k1: 词频饱和参数
+            b: 文档长度归一化参数
+        """
+        self.k1 = k1
+        self.b = b
+        self.windows: List[SubtitleWindow] = []
+        self._lengths: List[int] = []
+        self._total_length = 0
+        # token -> [(窗口下标, 词频)]
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self.windows)
+
+    def estimate_size(self) -> int:
+        """估算索引占用的内存（字节）"""
+        postings = sum(len(p) for p in self._postings.values())
+        return (
+            sys.getsizeof(self._postings)
+            + sum(sys.getsizeof(token) for token in self._postings)
+            + postings * 72
+            + len(self._lengths) * 36
+        )
+
+    def add_windows(
+        self,
+        windows: Sequence[SubtitleWindow],
+        transcript: CompactTranscript,
+    ) -> None:
+        """将同一视频的字幕窗口加入索引
+
+        Args:
+            windows: 字幕窗口列表
+            transcript: 窗口所属视频的列式字幕
+        """
+        for window in windows:
+            doc_id = len(self.windows)
+            tokens = tokenize(window_text(transcript, window))
+            self.windows.append(window)
+            self._lengths.append(len(tokens))
+            self._total_length += len(tokens)
+            for token, freq in Counter(tokens).items():
+                self._postings[token].append((doc_id, freq))
+
+    def search(self, query: str) -> Dict[int, float]:
+        """计算查询与各窗口的 BM25 得分
+
+        Args:
+            query: 查询文本
+
+        Returns:
+            Dict[int, float]: 窗口下标 -> 得分，只包含得分大于0的窗口
+        """
+        if not self.windows:
+            return {}
+
+        n = len(self.windows)
+        avg_length = self._total_length / n or 1.0
+        scores: Dict[int, float] = defaultdict(float)
+        for token in set(tokenize(query)):
+            postings = self._postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, freq in postings:
+                norm = self.k1 * (
+                    1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * freq * (self.k1 + 1) / (freq + norm)
+        return scores
+
+    def top_windows(
+        self,
+        query: str,
+        top_k: int = 3,
+    ) -> Dict[str, List[Tuple[SubtitleWindow, float]]]:
+        """按视频返回得分最高的窗口
+
+        Args:
+            query: 查询文本
+            top_k: 每个视频最多返回的窗口数
+
+        Returns:
+            Dict[str, List[Tuple[SubtitleWindow, float]]]: 视频ID -> [(窗口, 得分)]，
+                按得分从高到低排序；没有词项重叠的视频不会出现在结果中
+        """
+        by_video: Dict[str, List[Tuple[SubtitleWindow, float]]] = defaultdict(list)
+        for doc_id, score in self.search(query).items():
+            window = self.windows[doc_id]
+            by_video[window.video_id].append((window, score))
+
+        return {
+            video_id: sorted(hits, key=lambda x: x[1], reverse=True)[:top_k]
+            for video_id, hits in by_video.items()
+        }
@@ -1,15 +1,32 @@
 import os
 import structlog
 from datetime import datetime, timedelta
-from typing import List, Dict, Tuple, TypedDict
+from typing import (
+    Any, AsyncIterator, Awaitable, Callable, List, Dict, Optional, Set, Tuple,
+    TypedDict,
+)
 import uuid
 import asyncio
 
-from .client import YouTubeClient
-from .models import SearchResponse, SearchSummary, VideoInfo
+import numpy as np
+
+from .client import YOUTUBE_API_BASE_URL, YouTubeClient
+from .corpus import CorpusDisabledError, create_corpus
+from .embedding import create_embedding_provider
+from .llm_cache import create_llm_cache
+from .metrics import SUBTITLE_TOKENS, track_stage
+from .models import (
+    BatchSearchResponse, SearchResponse, SearchSummary, SessionStatus, VideoInfo,
+    VideoStatus,
+)
 from .openai_client import OpenAIClient
+from .quota import quota_lane
+from .resilience import deadline_timeout, detached_deadline
 from .subtitle import SubtitleFetcher
-from .session import SearchSession
+from .session import PreparedTranscript, SearchSession, prepare_transcript
+from .session_store import SessionStore
+from .summarizer import TranscriptSummarizer
+from .transcript_cache import create_transcript_cache
 
 logger = structlog.get_logger()
 
@@ -21,30 +38,196 @@ class SearchResult(TypedDict):
 
 
 class YouTubeService:
-    def __init__(self):
-        self.youtube_client = YouTubeClient(
-            api_key=os.getenv("YOUTUBE_API_KEY", ""))
-        self.openai_client = OpenAIClient(
-            api_key=os.getenv("OPENAI_API_KEY", ""))
-        self.subtitle_fetcher = SubtitleFetcher()
-        self.sessions: Dict[str, SearchSession] = {}
-
-    async def _fetch_video_info(self, video) -> Tuple[VideoInfo, List[Dict]]:
-        """获取单个视频的信息和字幕
+    def __init__(
+        self,
+        youtube_client: Optional[YouTubeClient] = None,
+        openai_client: Optional[OpenAIClient] = None,
+        subtitle_fetcher: Optional[SubtitleFetcher] = None,
+    ):
+        """初始化服务，未传入的上游客户端按环境变量创建
 
         Args:
-            video: YouTube视频信息
+            youtube_client: YouTube Data API 客户端，基准测试等场景可传入
+                指向桩服务的实例
+            openai_client: OpenAI 客户端
+            subtitle_fetcher: 字幕获取器
+        """
+        self.youtube_client = youtube_client or YouTubeClient(
+            api_key=os.getenv("YOUTUBE_API_KEY", ""),
+            search_cache_ttl=float(os.getenv("YOUTUBE_SEARCH_CACHE_TTL", 600)),
+            video_cache_ttl=float(os.getenv("YOUTUBE_VIDEO_CACHE_TTL", 3600)),
+            base_url=os.getenv("YOUTUBE_API_BASE_URL", YOUTUBE_API_BASE_URL),
+            timeout=float(os.getenv("YOUTUBE_API_TIMEOUT", 10)))
+        self.openai_client = openai_client or OpenAIClient(
+            api_key=os.getenv("OPENAI_API_KEY", ""),
+            cache=create_llm_cache())
+        self.subtitle_fetcher = subtitle_fetcher or SubtitleFetcher(
+            cache=create_transcript_cache(),
+            max_workers=int(os.getenv("TRANSCRIPT_WORKERS", 8)))
+        # 所有入库视频的持久化字幕语料库，会话过期后仍可全文检索
+        self.corpus = create_corpus()
+        self.sessions = SessionStore(
+            max_sessions=int(os.getenv("SESSION_MAX_COUNT", 1000)),
+            max_bytes=int(os.getenv("SESSION_MAX_BYTES", 512 * 1024 * 1024)),
+            sweep_interval=float(os.getenv("SESSION_SWEEP_INTERVAL", 60)),
+            snapshot_path=(
+                os.getenv("SESSION_SNAPSHOT_PATH", ".cache/sessions.snap") or None),
+            snapshot_interval=float(os.getenv("SESSION_SNAPSHOT_INTERVAL", 300)))
+        # 会话分析时的并发数和单个视频的超时时间（秒）
+        self.analyze_concurrency = int(os.getenv("ANALYZE_CONCURRENCY", 5))
+        self.analyze_timeout = float(os.getenv("ANALYZE_TIMEOUT", 60))
+        # 每个视频发送给 LLM 的字幕窗口数及窗口时长（秒）
+        self.analyze_top_windows = int(os.getenv("ANALYZE_TOP_WINDOWS", 3))
+        # 每次分析最多发送给 LLM 的视频数，会话视频较多时只分析检索排名靠前的视频
+        self.analyze_max_videos = int(os.getenv("ANALYZE_MAX_VIDEOS", 10))
+        # 批量分析：每次请求包含的视频数（0 或 1 表示逐个视频分析）及每个视频的片段数
+        self.analyze_batch_size = int(os.getenv("ANALYZE_BATCH_SIZE", 0))
+        self.analyze_clips_per_video = int(os.getenv("ANALYZE_CLIPS_PER_VIDEO", 3))
+        self.window_seconds = float(os.getenv("SUBTITLE_WINDOW_SECONDS", 60))
+        # 入库时合并字幕片段的最大时长（秒），0 表示不做预处理
+        self.segment_seconds = float(os.getenv("SUBTITLE_SEGMENT_SECONDS", 20))
+        # 入库时同时获取字幕的视频数
+        self.ingest_concurrency = int(os.getenv("INGEST_CONCURRENCY", 16))
+        # 字幕窗口向量化器及向量检索的最低相似度
+        self.embedder = create_embedding_provider()
+        self.embedding_min_score = float(os.getenv("EMBEDDING_MIN_SCORE", 0.2))
+        # 按 token 预算分块的 map-reduce 总结
+        self.summarizer = TranscriptSummarizer(
+            self.openai_client,
+            chunk_tokens=int(os.getenv("SUMMARY_CHUNK_TOKENS", 3000)),
+            concurrency=int(os.getenv("SUMMARY_CONCURRENCY", 4)))
+        # 后台字幕获取和总结任务的时间预算（秒），不受发起请求的 REQUEST_TIMEOUT 约束
+        self.background_timeout = float(os.getenv("BACKGROUND_TASK_TIMEOUT", 300))
+        self._background_tasks: Set[asyncio.Task] = set()
+
+    def metrics_sources(self) -> Dict[str, Callable[[], Optional[Dict]]]:
+        """各组件统计信息的读取函数，供 /metrics 抓取时调用
 
         Returns:
-            Tuple[VideoInfo, List[Dict]]: 视频信息和字幕列表
+            Dict[str, Callable[[], Optional[Dict]]]: 组件名 -> 返回统计字典的函数，
+                未启用的组件返回None
         """
-        logger.info("fetching_video_info", video_id=video.video_id)
+        def optional_stats(component: Any) -> Optional[Dict]:
+            return component.stats() if component is not None else None
 
-        # 获取字幕信息
-        transcript = await self.subtitle_fetcher.get_transcript(video.video_id)
-        has_subtitles = transcript is not None
+        return {
+            "sessions": lambda: self.sessions.stats(),
+            "youtube_search_cache": lambda: self.youtube_client._search_cache.stats(),
+            "youtube_video_cache": lambda: self.youtube_client._video_cache.stats(),
+            "transcript_cache": lambda: optional_stats(self.subtitle_fetcher.cache),
+            "transcript_executor": lambda: self.subtitle_fetcher.stats(),
+            "llm_cache": lambda: optional_stats(self.openai_client.cache),
+            "corpus": lambda: optional_stats(self.corpus),
+            "youtube_quota": lambda: optional_stats(self.youtube_client.quota),
+            "youtube_breaker": lambda: self.youtube_client.breaker.stats(),
+            "transcripts_breaker": lambda: self.subtitle_fetcher.breaker.stats(),
+            "openai_breaker": lambda: self.openai_client.breaker.stats(),
+            "background": lambda: {"tasks": len(self._background_tasks)},
+        }
+
+    async def start(self) -> None:
+        """启动后台任务"""
+        self.sessions.start()
+
+    async def close(self) -> None:
+        """停止后台任务并释放连接池、字幕下载线程池等资源"""
+        for task in list(self._background_tasks):
+            task.cancel()
+        await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        await self.sessions.stop()
+        await self.youtube_client.close()
+        await self.subtitle_fetcher.close()
+        if self.corpus is not None:
+            self.corpus.close()
+
+    async def get_session(self, session_id: str) -> SearchSession:
+        """获取有效会话并更新最后访问时间，会话仅存在于快照中时先加载
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            SearchSession: 会话实例
+
+        Raises:
+            ValueError: 会话不存在或已过期
+        """
+        session = await self.sessions.get_or_restore(session_id)
+        if not session:
+            raise ValueError(f"Session {session_id} not found")
+
+        if session.is_expired():
+            raise ValueError(f"Session {session_id} has expired")
+
+        # 更新最后访问时间
+        session.update_last_accessed()
+        return session
+
+    def _create_session(self, keyword: str) -> SearchSession:
+        """创建并登记新的搜索会话
+
+        会话在处理完成前被固定在存储中，不会被淘汰；处理结束后需调用 _release。
+
+        Args:
+            keyword: 搜索关键词
+
+        Returns:
+            SearchSession: 新会话
+        """
+        session = SearchSession(
+            str(uuid.uuid4()),
+            window_seconds=self.window_seconds,
+            segment_seconds=self.segment_seconds)
+        session.search_keyword = keyword
+        self.sessions[session.session_id] = session
+        self.sessions.pin(session.session_id)
+        return session
+
+    def _release(self, *sessions: SearchSession) -> None:
+        """会话处理结束，允许存储按上限淘汰"""
+        for session in sessions:
+            self.sessions.unpin(session.session_id)
+
+    def _prepare_transcript(
+        self,
+        video_id: str,
+        transcript: Optional[List[Dict]]
+    ) -> Optional[PreparedTranscript]:
+        """预处理字幕，并记录预处理节省的 token
+
+        Args:
+            video_id: 视频ID
+            transcript: 字幕列表，无字幕时为None
+
+        Returns:
+            Optional[PreparedTranscript]: 可在会话间共享的字幕，无字幕时为None
+        """
+        prepared = prepare_transcript(transcript, self.segment_seconds)
+        if prepared is None or prepared.stats is None:
+            return prepared
+        stats = prepared.stats
+        SUBTITLE_TOKENS.labels("raw").inc(stats.raw_tokens)
+        SUBTITLE_TOKENS.labels("processed").inc(stats.tokens)
+        logger.info("subtitles_preprocessed",
+                    video_id=video_id,
+                    raw_lines=stats.raw_lines,
+                    lines=stats.lines,
+                    raw_tokens=stats.raw_tokens,
+                    tokens=stats.tokens,
+                    saved_ratio=round(stats.saved_ratio, 3))
+        return prepared
+
+    def _video_info(self, video, has_subtitles: bool) -> VideoInfo:
+        """由 YouTube 视频信息构建响应中的 VideoInfo
+
+        Args:
+            video: YouTube视频信息
+            has_subtitles: 是否有字幕
 
-        video_info = VideoInfo(
+        Returns:
+            VideoInfo: 视频信息
+        """
+        return VideoInfo(
             video_id=video.video_id,
             title=video.title,
             channel_title=video.channel_title,
@@ -56,66 +239,238 @@ class YouTubeService:
             has_subtitles=has_subtitles
         )
 
-        subtitles = []
-        if transcript:
-            subtitles = [{
-                "video_id": video.video_id,
-                "video_title": video.title,
-                **sub
-            } for sub in transcript]
+    async def _fetch_video_info(self, video) -> Tuple[VideoInfo, Optional[List[Dict]]]:
+        """获取单个视频的信息和字幕
+
+        Args:
+            video: YouTube视频信息
+
+        Returns:
+            Tuple[VideoInfo, Optional[List[Dict]]]: 视频信息和字幕列表，无字幕时为None
+        """
+        logger.info("fetching_video_info", video_id=video.video_id)
+
+        # 获取字幕信息
+        transcript = await self.subtitle_fetcher.get_transcript(video.video_id)
+        return self._video_info(video, transcript is not None), transcript
+
+    async def _prepare_video(
+        self,
+        video,
+    ) -> Tuple[VideoInfo, Optional[PreparedTranscript]]:
+        """获取单个视频的信息和字幕，预处理字幕并写入语料库
+
+        Args:
+            video: YouTube视频信息
+
+        Returns:
+            Tuple[VideoInfo, Optional[PreparedTranscript]]: 视频信息和
+                可在会话间共享的字幕，无字幕时为None
+        """
+        video_info, transcript = await self._fetch_video_info(video)
+        prepared = self._prepare_transcript(video.video_id, transcript)
+        if prepared is not None and self.corpus is not None:
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.corpus.upsert, video_info, prepared.transcript)
+            except Exception as e:
+                logger.warning("corpus_upsert_failed",
+                               video_id=video.video_id,
+                               error=str(e))
+        return video_info, prepared
+
+    def _spawn(self, coro: Awaitable[None]) -> None:
+        """启动后台任务，服务关闭时取消"""
+        task = asyncio.ensure_future(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _ingest_videos(
+        self,
+        session: SearchSession,
+        videos: List,
+    ) -> List[VideoInfo]:
+        """以有界并发获取字幕，每个视频完成后立即写入会话
+
+        字幕写入会话时即转换为预处理后的列式存储，同时在途的原始字幕不超过
+        INGEST_CONCURRENCY 个，视频数较多时内存占用不随视频数增长。
+        全部完成后会话中的视频按搜索结果顺序排列。
+
+        Args:
+            session: 会话实例
+            videos: YouTube视频信息列表
+
+        Returns:
+            List[VideoInfo]: 按搜索结果顺序排列的视频信息
+        """
+        semaphore = asyncio.Semaphore(self.ingest_concurrency)
+
+        async def ingest(video) -> VideoInfo:
+            async with semaphore:
+                try:
+                    video_info, prepared = await self._prepare_video(video)
+                except Exception as e:
+                    session.video_status[video.video_id] = "failed"
+                    logger.warning("ingest_video_failed",
+                                   session_id=session.session_id,
+                                   video_id=video.video_id,
+                                   error=repr(e))
+                    return self._video_info(video, False)
+                session.add_prepared_video(video_info.dict(), prepared)
+                return video_info
+
+        video_infos = await asyncio.gather(*(ingest(video) for video in videos))
+        order = {video.video_id: i for i, video in enumerate(videos)}
+        session.videos.sort(key=lambda v: order[v["video_id"]])
+        self.sessions.refresh(session)
+        return list(video_infos)
+
+    async def _finish_session(self, *sessions: SearchSession) -> None:
+        """字幕写入完成后向量化字幕窗口并生成会话总结
+
+        多个会话共享的视频只向量化和总结一次。
+
+        Args:
+            sessions: 会话实例
+        """
+        await self._embed_session_videos(*sessions)
+        for session in sessions:
+            self.sessions.refresh(session)
 
-        return video_info, (transcript, subtitles)
+        if len(sessions) > 1:
+            await self.summarizer.summarize_videos(sessions)
 
-    async def search_videos(self, keyword: str, max_results: int = 3) -> SearchResponse:
+        async def summarize(session: SearchSession) -> None:
+            with track_stage("summarize_session"):
+                session.overview = await self.summarizer.summarize_session(
+                    session, max_tokens=300)
+            session.summary_status = "ready"
+            self.sessions.refresh(session)
+
+        await asyncio.gather(*(summarize(session) for session in sessions))
+
+    async def _complete_session(
+        self,
+        *sessions: SearchSession,
+        videos: Optional[List] = None,
+    ) -> None:
+        """在后台完成会话处理，结果写入会话供 get_session_status 查询
+
+        Args:
+            sessions: 会话实例
+            videos: 单个会话尚未获取字幕的视频，为None时只生成总结
+        """
+        try:
+            with detached_deadline(self.background_timeout):
+                if videos is not None:
+                    await self._ingest_videos(sessions[0], videos)
+                await self._finish_session(*sessions)
+            logger.info("session_completed_in_background",
+                        session_ids=[session.session_id for session in sessions],
+                        total_videos=sum(len(session.videos) for session in sessions))
+        except Exception as e:
+            for session in sessions:
+                if session.summary_status == "pending":
+                    session.summary_status = "failed"
+                for video_id, status in session.video_status.items():
+                    if status == "pending":
+                        session.video_status[video_id] = "failed"
+            logger.error("complete_session_failed",
+                         session_ids=[session.session_id for session in sessions],
+                         error=str(e),
+                         exc_info=True)
+        finally:
+            self._release(*sessions)
+
+    def _session_summary(self, session: SearchSession) -> SearchSummary:
+        """由会话当前状态构建总结，总结未就绪时 overview 为视频数提示"""
+        total_videos = len(session.video_status)
+        return SearchSummary(
+            total_videos=total_videos,
+            overview=(session.overview if session.overview
+                      else f"找到{total_videos}个相关视频。"),
+            status=session.summary_status
+        )
+
+    async def get_session_status(self, session_id: str) -> SessionStatus:
+        """查询会话的后台处理进度
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            SessionStatus: 会话整体状态、总结及每个视频的就绪状态
+
+        Raises:
+            ValueError: 会话不存在或已过期
+        """
+        session = await self.get_session(session_id)
+        return SessionStatus(
+            session_id=session.session_id,
+            keyword=session.search_keyword,
+            status=session.get_status(),
+            summary=self._session_summary(session),
+            videos=[
+                VideoStatus(video_id=video_id, status=status)
+                for video_id, status in session.video_status.items()
+            ]
+        )
+
+    async def search_videos(
+        self,
+        keyword: str,
+        max_results: int = 3,
+        background: bool = False,
+        wait_for_subtitles: bool = True
+    ) -> SearchResponse:
         """搜索视频并创建会话
 
+        background 为 True 时总结在后台生成，响应中的总结状态为 pending，
+        进度通过 get_session_status 查询。
+
         Args:
             keyword: 搜索关键词
             max_results: 最大返回结果数
+            background: 是否在后台生成总结
+            wait_for_subtitles: 后台模式下是否等待字幕获取完成再返回；为 False 时
+                字幕也在后台获取，响应中的 has_subtitles 以会话状态为准
 
         Returns:
             SearchResponse: 搜索响应
         """
+        session = None
+        # 交给后台任务后由其负责释放会话
+        detached = False
         try:
             # 搜索视频
             logger.info("searching_videos", keyword=keyword,
-                        max_results=max_results)
+                        max_results=max_results,
+                        background=background)
             videos = await self.youtube_client.search_videos(keyword, max_results)
 
             # 创建会话
-            session_id = str(uuid.uuid4())
-            session = SearchSession(session_id)
-            session.search_keyword = keyword
-            self.sessions[session_id] = session
-
-            # 并发获取视频详细信息和字幕
-            tasks = [self._fetch_video_info(video) for video in videos]
-            results = await asyncio.gather(*tasks)
-
-            video_infos = []
-            all_subtitles = []
-
-            # 处理结果
-            for video_info, (transcript, subtitles) in results:
-                video_infos.append(video_info)
-                all_subtitles.extend(subtitles)
-                # 存储视频和字幕信息到会话
-                session.add_video(video_info.dict(), transcript)
+            session = self._create_session(keyword)
+            session_id = session.session_id
 
-            transcript_text = ""
-            for sub in all_subtitles:
-                transcript_text += f"[{sub['video_title']}] {sub['text']}\n"
+            if background and not wait_for_subtitles:
+                # 只返回视频元数据，字幕获取和总结都在后台进行
+                video_infos = [self._video_info(video, False) for video in videos]
+                for video in videos:
+                    session.video_status[video.video_id] = "pending"
+                self._spawn(self._complete_session(session, videos=videos))
+                detached = True
+            else:
+                # 并发获取字幕并逐个写入会话
+                video_infos = await self._ingest_videos(session, videos)
 
-            overview = await self.openai_client.generate_video_sumary(
-                transcript=transcript_text,
-                max_tokens=300
-            )
+                if background:
+                    self._spawn(self._complete_session(session))
+                    detached = True
+                else:
+                    await self._finish_session(session)
 
             # 创建总结
-            summary = SearchSummary(
-                total_videos=len(video_infos),
-                overview=overview if overview else f"找到{len(video_infos)}个相关视频。"
-            )
+            summary = self._session_summary(session)
 
             # 创建响应
             now = datetime.utcnow()
@@ -140,6 +495,340 @@ class YouTubeService:
                          error=str(e),
                          exc_info=True)
             raise
+        finally:
+            if session is not None and not detached:
+                self._release(session)
+
+    async def search_videos_batch(
+        self,
+        keywords: List[str],
+        max_results: int = 3,
+        background: bool = False
+    ) -> BatchSearchResponse:
+        """批量搜索视频，每个关键词创建一个会话
+
+        所有关键词的视频ID去重后统一获取元数据，每个视频的字幕只获取和预处理一次，
+        各会话共享同一份列式字幕；字幕窗口向量和单视频总结也只计算一次。
+
+        Args:
+            keywords: 搜索关键词列表，重复的关键词只搜索一次
+            max_results: 每个关键词的最大返回结果数
+            background: 是否在后台生成各会话的总结
+
+        Returns:
+            BatchSearchResponse: 按关键词顺序排列的搜索响应
+        """
+        keywords = list(dict.fromkeys(keywords))
+        sessions: List[SearchSession] = []
+        detached = False
+        try:
+            logger.info("searching_videos_batch",
+                        keywords=len(keywords),
+                        max_results=max_results,
+                        background=background)
+            # 批量搜索使用低优先级配额通道，不占用为单次搜索预留的配额
+            with quota_lane("batch"):
+                videos_by_keyword = await self.youtube_client.search_videos_batch(
+                    keywords, max_results)
+            unique_videos = {
+                video.video_id: video
+                for videos in videos_by_keyword.values() for video in videos
+            }
+
+            # 每个视频只获取一次字幕，同时在途的原始字幕不超过 INGEST_CONCURRENCY 个
+            semaphore = asyncio.Semaphore(self.ingest_concurrency)
+
+            async def fetch(video) -> Tuple[VideoInfo, Optional[PreparedTranscript]]:
+                async with semaphore:
+                    try:
+                        return await self._prepare_video(video)
+                    except Exception as e:
+                        logger.warning("ingest_video_failed",
+                                       video_id=video.video_id,
+                                       error=repr(e))
+                        return self._video_info(video, False), None
+
+            fetched = dict(zip(unique_videos, await asyncio.gather(
+                *(fetch(video) for video in unique_videos.values()))))
+
+            for keyword in keywords:
+                session = self._create_session(keyword)
+                for video in videos_by_keyword[keyword]:
+                    video_info, prepared = fetched[video.video_id]
+                    session.add_prepared_video(video_info.dict(), prepared)
+                self.sessions.refresh(session)
+                sessions.append(session)
+
+            if background:
+                self._spawn(self._complete_session(*sessions))
+                detached = True
+            else:
+                await self._finish_session(*sessions)
+
+            now = datetime.utcnow()
+            results = [
+                SearchResponse(
+                    session_id=session.session_id,
+                    keyword=session.search_keyword,
+                    summary=self._session_summary(session),
+                    videos=[fetched[video.video_id][0]
+                            for video in videos_by_keyword[session.search_keyword]],
+                    created_at=now,
+                    expires_at=now + timedelta(hours=1)
+                )
+                for session in sessions
+            ]
+            logger.info("batch_search_response_created",
+                        keywords=len(keywords),
+                        unique_videos=len(unique_videos),
+                        total_videos=sum(
+                            len(videos) for videos in videos_by_keyword.values()))
+            return BatchSearchResponse(
+                results=results, unique_videos=len(unique_videos))
+
+        except Exception as e:
+            logger.error("search_videos_batch_failed",
+                         keywords=keywords,
+                         error=str(e),
+                         exc_info=True)
+            raise
+        finally:
+            if not detached:
+                self._release(*sessions)
+
+    async def search_videos_stream(
+        self,
+        keyword: str,
+        max_results: int = 3
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """搜索视频并创建会话，按处理进度逐步产生事件
+
+        事件依次为：session（会话信息）、videos（视频元数据）、
+        每个视频完成字幕获取后的 subtitle、总结生成过程中的 summary_delta、
+        最终的 summary 和 done；出错时产生 error。
+
+        Args:
+            keyword: 搜索关键词
+            max_results: 最大返回结果数
+
+        Yields:
+            Tuple[str, Any]: (事件名, 事件数据)
+        """
+        tasks: List[asyncio.Future] = []
+        session = None
+        try:
+            logger.info("searching_videos_stream", keyword=keyword,
+                        max_results=max_results)
+            videos = await self.youtube_client.search_videos(keyword, max_results)
+
+            session = self._create_session(keyword)
+            now = datetime.utcnow()
+            yield "session", {
+                "session_id": session.session_id,
+                "keyword": keyword,
+                "created_at": now,
+                "expires_at": now + timedelta(hours=1),
+            }
+            yield "videos", videos
+            for video in videos:
+                session.video_status[video.video_id] = "pending"
+
+            # 并发获取字幕，每完成一个视频就推送一次状态；
+            # 与 _ingest_videos 相同，同时在途的原始字幕不超过 INGEST_CONCURRENCY 个
+            semaphore = asyncio.Semaphore(self.ingest_concurrency)
+
+            async def prepare(
+                video,
+            ) -> Tuple[VideoInfo, Optional[PreparedTranscript]]:
+                async with semaphore:
+                    try:
+                        return await self._prepare_video(video)
+                    except Exception as e:
+                        session.video_status[video.video_id] = "failed"
+                        logger.warning("ingest_video_failed",
+                                       session_id=session.session_id,
+                                       video_id=video.video_id,
+                                       error=repr(e))
+                        return self._video_info(video, False), None
+
+            tasks = [asyncio.ensure_future(prepare(video)) for video in videos]
+            for future in asyncio.as_completed(tasks):
+                video_info, _ = await future
+                yield "subtitle", {
+                    "video_id": video_info.video_id,
+                    "has_subtitles": video_info.has_subtitles,
+                }
+
+            # 按搜索结果顺序写入会话
+            video_infos = []
+            for task in tasks:
+                video_info, prepared = task.result()
+                video_infos.append(video_info)
+                # 与 _ingest_videos 相同，获取失败的视频不写入会话
+                if session.video_status.get(video_info.video_id) != "failed":
+                    session.add_prepared_video(video_info.dict(), prepared)
+
+            await self._embed_session_videos(session)
+            self.sessions.refresh(session)
+
+            overview_parts = []
+            async for delta in self.summarizer.stream_session_summary(
+                    session, max_tokens=300):
+                overview_parts.append(delta)
+                yield "summary_delta", {"text": delta}
+
+            session.overview = "".join(overview_parts)
+            session.summary_status = "ready"
+            yield "summary", self._session_summary(session)
+            yield "done", {"session_id": session.session_id}
+
+        except Exception as e:
+            logger.error("search_videos_stream_failed",
+                         keyword=keyword,
+                         error=str(e),
+                         exc_info=True)
+            if session is not None:
+                session.summary_status = "failed"
+            yield "error", {"detail": str(e)}
+        finally:
+            # 客户端断开时取消尚未完成的字幕获取
+            for task in tasks:
+                task.cancel()
+            if session is not None:
+                self._release(session)
+
+    async def _embed_session_videos(self, *sessions: SearchSession) -> None:
+        """为会话中尚未向量化的视频计算字幕窗口向量
+
+        多个会话包含同一视频时（共享同一份字幕，窗口相同），该视频只向量化一次。
+
+        Args:
+            sessions: 会话实例
+        """
+        if self.embedder is None:
+            return
+
+        owners: Dict[str, List[SearchSession]] = {}
+        for session in sessions:
+            indexed = {window.video_id for window in session.vectors.windows}
+            for video_id in session.windows:
+                if video_id not in indexed:
+                    owners.setdefault(video_id, []).append(session)
+        if not owners:
+            return
+
+        texts: List[str] = []
+        rows: Dict[str, range] = {}
+        for video_id, video_sessions in owners.items():
+            begin = len(texts)
+            texts.extend(video_sessions[0].window_texts(video_id))
+            rows[video_id] = range(begin, len(texts))
+
+        try:
+            with track_stage("embed_windows"):
+                vectors = await self.embedder.embed(texts)
+        except Exception as e:
+            logger.warning("embed_session_videos_failed",
+                           session_ids=[session.session_id for session in sessions],
+                           error=str(e))
+            return
+
+        for session in sessions:
+            video_ids = [
+                video_id for video_id, video_sessions in owners.items()
+                if session in video_sessions
+            ]
+            if video_ids:
+                session.vectors.add(
+                    [window for video_id in video_ids
+                     for window in session.windows[video_id]],
+                    vectors[[row for video_id in video_ids for row in rows[video_id]]])
+
+    async def _embed_query(
+        self,
+        session: SearchSession,
+        query: str
+    ) -> Optional[np.ndarray]:
+        """计算查询向量，会话没有向量索引或向量化失败时返回None
+
+        Args:
+            session: 会话实例
+            query: 用户问题
+
+        Returns:
+            Optional[np.ndarray]: 归一化的查询向量
+        """
+        if self.embedder is None or not len(session.vectors):
+            return None
+        try:
+            with track_stage("embed_query"):
+                return (await self.embedder.embed([query]))[0]
+        except Exception as e:
+            logger.warning("embed_query_failed",
+                           session_id=session.session_id,
+                           error=str(e))
+            return None
+
+    async def _clip_tasks(
+        self,
+        session: SearchSession,
+        query: str
+    ) -> List[Awaitable[List[Dict]]]:
+        """为会话中的候选视频创建片段分析任务
+
+        ANALYZE_BATCH_SIZE 大于 1 时，每个任务在一次请求中分析多个视频，
+        否则每个视频一个任务。
+
+        Args:
+            session: 会话实例
+            query: 用户问题
+
+        Returns:
+            List[Awaitable[List[Dict]]]: 按会话视频顺序排列的分析任务，
+                每个任务返回若干视频片段
+        """
+        # 并发分析每个视频的字幕，单个视频失败不影响其他视频
+        semaphore = asyncio.Semaphore(self.analyze_concurrency)
+
+        async def analyze(video: Dict, subtitles: str) -> List[Dict]:
+            async with semaphore:
+                clip = await self._analyze_video_clip(query, video, subtitles)
+                return [clip] if clip else []
+
+        async def analyze_batch(batch: List[Tuple[Dict, str]]) -> List[Dict]:
+            async with semaphore:
+                return await self._analyze_video_clips_batch(query, batch)
+
+        # 只把 BM25 和向量检索得分最高的字幕窗口发送给 LLM，跳过两者都未命中的视频；
+        # 若整个会话都没有命中，退回到分析完整字幕。字幕文本在入库时已渲染并缓存
+        query_vector = await self._embed_query(session, query)
+        candidates = session.select_subtitles(
+            query,
+            self.analyze_top_windows,
+            query_vector=query_vector,
+            min_score=self.embedding_min_score,
+            max_videos=self.analyze_max_videos)
+        if not candidates:
+            candidates = {
+                video_id: session.prompt_text(video_id)
+                for video_id in list(session.subtitles)[:self.analyze_max_videos]
+            }
+        logger.info("selected_candidate_videos",
+                    session_id=session.session_id,
+                    candidates=len(candidates),
+                    total=len(session.subtitles))
+
+        videos = [
+            (video, candidates[video["video_id"]])
+            for video in session.videos
+            if candidates.get(video["video_id"])
+        ]
+        if self.analyze_batch_size > 1:
+            return [
+                analyze_batch(videos[i:i + self.analyze_batch_size])
+                for i in range(0, len(videos), self.analyze_batch_size)
+            ]
+        return [analyze(video, subtitles) for video, subtitles in videos]
 
     async def _find_relevant_clips_from_session(self, session_id: str, query: str) -> List[Dict]:
         """在会话中查找与问题相关的视频片段
@@ -154,45 +843,12 @@ class YouTubeService:
         logger.info("finding_relevant_clips",
                     session_id=session_id, query=query)
         try:
-            # 获取会话
-            session = self.sessions.get(session_id)
-            if not session:
-                raise ValueError(f"Session {session_id} not found")
-
-            if session.is_expired():
-                raise ValueError(f"Session {session_id} has expired")
-
-            # 更新最后访问时间
-            session.update_last_accessed()
-
-            # 分析每个视频的字幕
-            results = []
-            for video in session.videos:
-                video_id = video["video_id"]
-                subtitles = session.subtitles.get(video_id)
-
-                if not subtitles:
-                    continue
+            session = await self.get_session(session_id)
 
-                # 分析字幕内容
-                analysis = await self.openai_client.analyze_subtitle(
-                    query=query,
-                    subtitles=subtitles,
-                    video_info=video
-                )
-
-                if analysis and analysis.get("clip"):
-                    clip = analysis["clip"]
-                    # 添加视频信息
-                    result = {
-                        "video_id": video_id,
-                        "video_title": video["title"],
-                        "content": clip["content"],
-                        "timestamp": clip["timestamp"],
-                        "relevance": clip["relevance"],
-                        "url": f"https://youtube.com/watch?v={video_id}&t={self._timestamp_to_seconds(clip['timestamp'])}"
-                    }
-                    results.append(result)
+            tasks = await self._clip_tasks(session, query)
+            results = [
+                clip for clips in await asyncio.gather(*tasks) for clip in clips
+            ]
 
             # 按相关度排序
             results.sort(key=lambda x: x["relevance"], reverse=True)
@@ -206,6 +862,135 @@ class YouTubeService:
                          exc_info=True)
             raise
 
+    async def _analyze_video_clip(
+        self,
+        query: str,
+        video: Dict,
+        subtitles: str
+    ) -> Optional[Dict]:
+        """分析单个视频字幕，找到与问题最相关的片段
+
+        Args:
+            query: 用户问题
+            video: 视频信息
+            subtitles: 渲染好的视频字幕文本
+
+        Returns:
+            Optional[Dict]: 视频片段信息，未找到、超时或分析失败时返回None
+        """
+        video_id = video["video_id"]
+        try:
+            analysis = await asyncio.wait_for(
+                self.openai_client.analyze_subtitle(
+                    query=query,
+                    subtitles=subtitles,
+                    video_info=video
+                ),
+                timeout=deadline_timeout(self.analyze_timeout)
+            )
+        except Exception as e:
+            logger.warning("analyze_video_failed",
+                           video_id=video_id,
+                           query=query,
+                           error=repr(e))
+            return None
+
+        if not analysis or not analysis.get("clip"):
+            return None
+
+        return self._make_clip(video, analysis["clip"])
+
+    async def _analyze_video_clips_batch(
+        self,
+        query: str,
+        batch: List[Tuple[Dict, str]]
+    ) -> List[Dict]:
+        """在一次请求中分析多个视频的字幕，每个视频可返回多个片段
+
+        Args:
+            query: 用户问题
+            batch: (视频信息, 渲染好的字幕文本) 列表
+
+        Returns:
+            List[Dict]: 视频片段列表，超时或分析失败时为空列表
+        """
+        try:
+            analysis = await asyncio.wait_for(
+                self.openai_client.analyze_subtitles_batch(
+                    query=query,
+                    videos=batch,
+                    max_clips_per_video=self.analyze_clips_per_video
+                ),
+                timeout=deadline_timeout(self.analyze_timeout)
+            )
+        except Exception as e:
+            logger.warning("analyze_video_batch_failed",
+                           video_ids=[video["video_id"] for video, _ in batch],
+                           query=query,
+                           error=repr(e))
+            return []
+
+        return [
+            self._make_clip(video, clip)
+            for video, _ in batch
+            for clip in analysis.get(video["video_id"], [])
+        ]
+
+    def _make_clip(self, video: Dict, clip: Dict) -> Dict:
+        """由 LLM 返回的片段构建带视频信息和直达链接的结果
+
+        Args:
+            video: 视频信息
+            clip: 包含 content、timestamp 和 relevance 的片段
+
+        Returns:
+            Dict: 视频片段信息
+        """
+        video_id = video["video_id"]
+        return {
+            "video_id": video_id,
+            "video_title": video["title"],
+            "content": clip["content"],
+            "timestamp": clip["timestamp"],
+            "relevance": clip["relevance"],
+            "url": f"https://youtube.com/watch?v={video_id}&t={self._timestamp_to_seconds(clip['timestamp'])}"
+        }
+
+    async def search_corpus(self, query: str, limit: int = 20) -> List[Dict]:
+        """在持久化语料库中全文检索所有入库过的视频字幕，不调用 YouTube 和 OpenAI
+
+        Args:
+            query: 查询文本
+            limit: 最多返回的片段数
+
+        Returns:
+            List[Dict]: 按相关度排序的片段，每项包含视频信息、内容、时间戳和直达链接
+
+        Raises:
+            CorpusDisabledError: 语料库未启用
+        """
+        if self.corpus is None:
+            raise CorpusDisabledError("Transcript corpus is disabled")
+
+        with track_stage("corpus_search"):
+            rows = await asyncio.get_running_loop().run_in_executor(
+                None, self.corpus.search, query, limit)
+
+        segments = []
+        for row in rows:
+            start = int(row["start"])
+            segments.append({
+                "video_id": row["video_id"],
+                "video_title": row["video_title"],
+                "channel_title": row["channel_title"],
+                "content": row["text"],
+                "timestamp": f"{start // 60:02d}:{start % 60:02d}",
+                "score": row["score"],
+                "url": f"https://youtube.com/watch?v={row['video_id']}&t={start}",
+            })
+        logger.info("corpus_searched", query=query, segments=len(segments))
+        return segments
+
     def _timestamp_to_seconds(self, timestamp: str) -> int:
         """将 MM:SS 格式的时间戳转换为秒数
 
@@ -221,27 +1006,16 @@ class YouTubeService:
         except Exception:
             return 0
 
-    async def _answer_question_from_clips(
-        self,
-        session: SearchSession,
-        clips: List[Dict],
-        query: str
-    ) -> str:
-        """基于相关视频片段回答用户问题，如果没有相关片段则使用 LLM 知识回答
+    def _build_clip_context(self, session: SearchSession, clips: List[Dict]) -> str:
+        """收集相关片段前后1分钟的字幕，构建回答问题的上下文
 
         Args:
             session: 会话实例
             clips: 相关视频片段列表
-            query: 用户问题
 
         Returns:
-            str: 生成的回答
+            str: 上下文文本，没有可用字幕时为空字符串
         """
-        logger.info("answering_question_from_clips",
-                    session_id=session.session_id,
-                    query=query,
-                    clips=clips)
-
         # 收集相关视频的字幕
         relevant_subtitles = []
 
@@ -252,34 +1026,50 @@ class YouTubeService:
                 timestamp = clip["timestamp"]
 
                 # 获取视频字幕
-                subtitles = session.subtitles.get(video_id, [])
-                if not subtitles:
+                transcript = session.subtitles.get(video_id)
+                if not transcript:
                     continue
 
                 # 将时间戳转换为秒数
                 clip_time = self._timestamp_to_seconds(timestamp)
 
-                # 获取片段前后的上下文（前后1分钟）
-                context_subtitles = []
-                for sub in subtitles:
-                    sub_time = int(sub.get("start", 0))
-                    if abs(sub_time - clip_time) <= 60:  # 获取片段前后1分钟的内容
-                        context_subtitles.append({
-                            "video_title": video_title,
-                            "text": sub.get("text", ""),
-                            "start": sub.get("start", 0)
-                        })
-
-                # 按时间排序
-                context_subtitles.sort(key=lambda x: x["start"])
-                relevant_subtitles.extend(context_subtitles)
+                # 二分查找片段前后1分钟的字幕（开始时间取整后与片段相差不超过60秒）
+                begin, end = transcript.index_range(clip_time - 60, clip_time + 61)
+                for i in range(begin, end):
+                    relevant_subtitles.append({
+                        "video_title": video_title,
+                        "text": transcript.text_at(i),
+                    })
 
         # 构建上下文
         context = ""
-        if relevant_subtitles:
-            for sub in relevant_subtitles:
-                context += f"[{sub['video_title']}] {sub['text']}\n"
+        for sub in relevant_subtitles:
+            context += f"[{sub['video_title']}] {sub['text']}\n"
+        return context
 
+    async def _answer_question_from_clips(
+        self,
+        session: SearchSession,
+        clips: List[Dict],
+        query: str
+    ) -> str:
+        """基于相关视频片段回答用户问题，如果没有相关片段则使用 LLM 知识回答
+
+        Args:
+            session: 会话实例
+            clips: 相关视频片段列表
+            query: 用户问题
+
+        Returns:
+            str: 生成的回答
+        """
+        logger.info("answering_question_from_clips",
+                    session_id=session.session_id,
+                    query=query,
+                    clips=clips)
+
+        context = self._build_clip_context(session, clips)
+        if context:
             # 生成基于视频内容的回答
             answer = await self.openai_client.answer_question(
                 query=query,
@@ -308,19 +1098,11 @@ class YouTubeService:
             SearchResult: 包含视频片段和LLM回答的搜索结果
         """
         try:
-            # 获取会话
-            session = self.sessions.get(session_id)
-            if not session:
-                raise ValueError(f"Session {session_id} not found")
-
-            if session.is_expired():
-                raise ValueError(f"Session {session_id} has expired")
-
-            # 更新最后访问时间
-            session.update_last_accessed()
+            session = await self.get_session(session_id)
 
             # 1. 先找到相关视频片段
-            clips = await self._find_relevant_clips_from_session(session_id, query)
+            with track_stage("find_clips"):
+                clips = await self._find_relevant_clips_from_session(session_id, query)
 
             # 2. 基于相关片段生成回答
             answer = await self._answer_question_from_clips(session, clips, query)
@@ -337,3 +1119,69 @@ class YouTubeService:
                          error=str(e),
                          exc_info=True)
             raise
+
+    async def search_session_content_stream(
+        self,
+        session_id: str,
+        query: str
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """搜索会话内容并生成回答，按处理进度逐步产生事件
+
+        事件依次为：每个视频分析完成后的 clip、按相关度排序的 clips、
+        回答生成过程中的 answer_delta、最终的 answer 和 done；出错时产生 error。
+
+        Args:
+            session_id: 会话ID
+            query: 用户问题
+
+        Yields:
+            Tuple[str, Any]: (事件名, 事件数据)
+        """
+        tasks: List[asyncio.Future] = []
+        try:
+            session = await self.get_session(session_id)
+            logger.info("finding_relevant_clips_stream",
+                        session_id=session_id, query=query)
+
+            tasks = [
+                asyncio.ensure_future(task)
+                for task in await self._clip_tasks(session, query)
+            ]
+            for future in asyncio.as_completed(tasks):
+                for clip in await future:
+                    yield "clip", clip
+
+            # 与非流式接口一致：按视频顺序收集后按相关度稳定排序
+            clips = [clip for task in tasks for clip in task.result()]
+            clips.sort(key=lambda x: x["relevance"], reverse=True)
+            yield "clips", clips
+
+            answer_parts = []
+            context = self._build_clip_context(session, clips)
+            if context:
+                async for delta in self.openai_client.stream_answer(
+                        query=query, transcript=context, max_tokens=500):
+                    answer_parts.append(delta)
+                    yield "answer_delta", {"text": delta}
+
+            # 如果没有相关片段或无法基于视频内容回答，使用 LLM 知识回答
+            if not answer_parts:
+                async for delta in self.openai_client.stream_answer(
+                        query=query, transcript="", max_tokens=800):
+                    answer_parts.append(delta)
+                    yield "answer_delta", {"text": delta}
+
+            answer = "".join(answer_parts)
+            yield "answer", {"text": answer if answer else "抱歉，我无法回答这个问题。"}
+            yield "done", {"session_id": session_id}
+
+        except Exception as e:
+            logger.error("search_session_content_stream_failed",
+                         session_id=session_id,
+                         query=query,
+                         error=str(e),
+                         exc_info=True)
+            yield "error", {"detail": str(e)}
+        finally:
+            for task in tasks:
+                task.cancel()
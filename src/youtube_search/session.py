@@ -1,26 +1,98 @@
-from typing import List, Dict, Optional
+import sys
+from typing import List, Dict, NamedTuple, Optional, Sequence
 import logging
 from datetime import datetime, timedelta
 
+import numpy as np
+
+from .embedding import VectorIndex
+from .preprocess import PreprocessStats, format_subtitle_line, preprocess_subtitles
+from .search_index import BM25Index, SubtitleWindow, build_windows, window_text
+from .transcript import CompactTranscript
+
 logger = logging.getLogger(__name__)
 
+# 倒数排名融合的平滑常数
+_RRF_K = 60
+
+
+class PreparedTranscript(NamedTuple):
+    """预处理并转换为列式存储的字幕，只读，可在多个会话间共享"""
+    transcript: CompactTranscript
+    prompt_lines: List[str]  # 渲染好的 [MM:SS] 字幕行
+    stats: Optional[PreprocessStats]  # 未做预处理时为None
+
+
+def prepare_transcript(
+    subtitles: Optional[List[Dict]],
+    segment_seconds: float = 20.0,
+) -> Optional[PreparedTranscript]:
+    """预处理字幕，转换为列式存储并渲染提示词文本行
+
+    Args:
+        subtitles: 原始字幕列表
+        segment_seconds: 合并字幕片段的最大时长（秒），为0时不做预处理
+
+    Returns:
+        Optional[PreparedTranscript]: 处理后的字幕，无字幕或预处理后为空时返回None
+    """
+    if not subtitles:
+        return None
+    stats = None
+    if segment_seconds > 0:
+        subtitles, stats = preprocess_subtitles(subtitles, segment_seconds)
+        if not subtitles:
+            return None
+    transcript = CompactTranscript.from_subtitles(subtitles)
+    return PreparedTranscript(transcript, render_prompt_lines(transcript), stats)
+
+
+def render_prompt_lines(transcript: CompactTranscript) -> List[str]:
+    """将列式字幕渲染为提示词中的 [MM:SS] 文本行"""
+    return [
+        format_subtitle_line(start, transcript.text_at(i))
+        for i, start in enumerate(transcript.starts)
+    ]
+
 
 class SearchSession:
     """管理视频搜索会话"""
 
-    def __init__(self, session_id: str):
+    def __init__(
+        self,
+        session_id: str,
+        window_seconds: float = 60.0,
+        segment_seconds: float = 20.0,
+    ):
         """初始化搜索会话
 
         Args:
             session_id: 会话ID
+            window_seconds: 字幕检索窗口的时长（秒）
+            segment_seconds: 预处理时合并字幕片段的最大时长（秒），为0时不做预处理
         """
         self.session_id = session_id
         self.created_at = datetime.now()
         self.last_accessed = datetime.now()
         self.search_keyword = ""
         self.videos: List[Dict] = []  # 存储视频信息
-        self.subtitles: Dict[str, List[Dict]] = {}  # video_id -> 字幕列表
+        self.subtitles: Dict[str, CompactTranscript] = {}  # video_id -> 列式字幕
         self.expire_after = timedelta(hours=1)  # 会话有效期
+        self.window_seconds = window_seconds
+        self.segment_seconds = segment_seconds
+        self.windows: Dict[str, List[SubtitleWindow]] = {}  # video_id -> 字幕窗口
+        self.index = BM25Index()  # 字幕窗口的 BM25 索引
+        self.vectors = VectorIndex()  # 字幕窗口的向量索引
+        self.video_summaries: Dict[str, str] = {}  # video_id -> 单视频总结
+        # video_id -> 渲染好的 [MM:SS] 字幕行
+        self.prompt_lines: Dict[str, List[str]] = {}
+        # video_id -> 预处理前后规模
+        self.preprocess_stats: Dict[str, PreprocessStats] = {}
+        # 后台处理进度：总结状态为 pending、ready 或 failed；
+        # 视频状态为 pending、ready、no_subtitles 或 failed，按搜索结果顺序排列
+        self.overview: Optional[str] = None
+        self.summary_status = "pending"
+        self.video_status: Dict[str, str] = {}
 
     def is_expired(self) -> bool:
         """检查会话是否过期"""
@@ -33,21 +105,126 @@ class SearchSession:
     def add_video(self, video_info: Dict, subtitles: Optional[List[Dict]] = None):
         """添加视频和字幕信息
 
+        字幕先经过预处理（合并片段、去除滚动重复和填充词），再转换为列式存储，
+        并缓存渲染好的提示词文本行，分析时无需为每次查询重新构建。
+
         Args:
             video_info: 视频信息
             subtitles: 字幕列表
         """
+        self.add_prepared_video(
+            video_info, prepare_transcript(subtitles, self.segment_seconds))
+
+    def add_prepared_video(
+        self,
+        video_info: Dict,
+        prepared: Optional[PreparedTranscript],
+    ):
+        """添加视频和已处理好的字幕，字幕数据可与其他会话共享
+
+        Args:
+            video_info: 视频信息
+            prepared: prepare_transcript 的结果，无字幕时为None
+        """
+        video_id = video_info["video_id"]
         self.videos.append(video_info)
-        if subtitles:
-            self.subtitles[video_info["video_id"]] = subtitles
+        self.video_status[video_id] = "ready" if prepared else "no_subtitles"
+        if prepared:
+            transcript = prepared.transcript
+            self.subtitles[video_id] = transcript
+            self.prompt_lines[video_id] = prepared.prompt_lines
+            if prepared.stats is not None:
+                self.preprocess_stats[video_id] = prepared.stats
+            windows = build_windows(video_id, transcript, self.window_seconds)
+            self.windows[video_id] = windows
+            self.index.add_windows(windows, transcript)
+
+    def window_texts(self, video_id: str) -> List[str]:
+        """获取视频各字幕窗口的文本，用于向量化
+
+        Args:
+            video_id: 视频ID
+
+        Returns:
+            List[str]: 与 self.windows[video_id] 一一对应的窗口文本
+        """
+        transcript = self.subtitles.get(video_id)
+        if transcript is None:
+            return []
+        return [window_text(transcript, w) for w in self.windows.get(video_id, [])]
+
+    def prompt_text(
+        self,
+        video_id: str,
+        windows: Optional[Sequence[SubtitleWindow]] = None,
+    ) -> str:
+        """获取视频的提示词字幕文本
+
+        Args:
+            video_id: 视频ID
+            windows: 只包含这些字幕窗口（应按时间排序），为None时返回完整字幕
+
+        Returns:
+            str: 每行形如 [MM:SS] 文本 的字幕内容
+        """
+        lines = self.prompt_lines.get(video_id, [])
+        if windows is None:
+            return "\n".join(lines)
+        return "\n".join(
+            line for window in windows for line in lines[window.begin:window.end])
+
+    def select_subtitles(
+        self,
+        query: str,
+        top_k: int = 3,
+        query_vector: Optional[np.ndarray] = None,
+        min_score: float = 0.0,
+        max_videos: Optional[int] = None,
+    ) -> Dict[str, str]:
+        """结合 BM25 和向量检索，为每个视频挑选与查询最相关的字幕窗口
+
+        Args:
+            query: 查询文本
+            top_k: 每种检索方式下每个视频最多保留的窗口数
+            query_vector: 归一化的查询向量，为None时只使用 BM25
+            min_score: 向量检索的最低相似度
+            max_videos: 最多保留的视频数，按两种检索中各视频最佳窗口排名的
+                倒数排名融合（RRF）得分选取，为None时不限制
+
+        Returns:
+            Dict[str, str]: video_id -> 候选窗口按时间顺序渲染的提示词字幕文本，
+                两种检索都未命中的视频不包含在内
+        """
+        hits_by_video: Dict[str, set] = {}
+        fused: Dict[str, float] = {}
+        rankings = [self.index.top_windows(query, top_k)]
+        if query_vector is not None:
+            rankings.append(self.vectors.top_windows(query_vector, top_k, min_score))
+
+        for ranking in rankings:
+            # BM25 与余弦相似度的尺度不同，只按各视频最佳窗口的排名融合
+            ordered = sorted(
+                ranking.items(), key=lambda item: item[1][0][1], reverse=True)
+            for rank, (video_id, hits) in enumerate(ordered):
+                hits_by_video.setdefault(video_id, set()).update(w for w, _ in hits)
+                fused[video_id] = fused.get(video_id, 0.0) + 1 / (_RRF_K + rank + 1)
+
+        if max_videos is not None and len(hits_by_video) > max_videos:
+            keep = sorted(fused, key=fused.get, reverse=True)[:max_videos]
+            hits_by_video = {video_id: hits_by_video[video_id] for video_id in keep}
+
+        return {
+            video_id: self.prompt_text(video_id, sorted(windows))
+            for video_id, windows in hits_by_video.items()
+        }
 
     def get_all_subtitles(self) -> List[Dict]:
         """获取所有字幕内容"""
         all_subtitles = []
-        for video_id, subs in self.subtitles.items():
+        for video_id, transcript in self.subtitles.items():
             video_info = next(
                 (v for v in self.videos if v["video_id"] == video_id), {})
-            for sub in subs:
+            for sub in transcript:
                 sub_with_video = {
                     **sub,
                     "video_id": video_id,
@@ -56,6 +233,35 @@ class SearchSession:
                 all_subtitles.append(sub_with_video)
         return all_subtitles
 
+    def estimate_size(self) -> int:
+        """估算会话占用的内存（字节），用于会话存储的容量控制
+
+        Returns:
+            int: 估算的字节数
+        """
+        size = sys.getsizeof(self.videos) + sum(
+            sys.getsizeof(video) for video in self.videos)
+        size += sum(transcript.nbytes for transcript in self.subtitles.values())
+        for windows in self.windows.values():
+            size += sys.getsizeof(windows) + len(windows) * 88
+        size += self.index.estimate_size() + self.vectors.nbytes
+        size += sum(sys.getsizeof(summary) for summary in self.video_summaries.values())
+        for lines in self.prompt_lines.values():
+            size += sys.getsizeof(lines) + sum(sys.getsizeof(line) for line in lines)
+        return size
+
+    def get_status(self) -> str:
+        """会话整体的处理状态
+
+        Returns:
+            str: ingesting（字幕获取中）、summarizing（总结生成中）、ready 或 failed
+        """
+        if "pending" in self.video_status.values():
+            return "ingesting"
+        if self.summary_status == "pending":
+            return "summarizing"
+        return "failed" if self.summary_status == "failed" else "ready"
+
     def get_session_info(self) -> Dict:
         """获取会话信息"""
         return {
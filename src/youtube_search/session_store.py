@@ -0,0 +1,348 @@
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Iterator, Optional, Set
+
+import structlog
+
+from .session import SearchSession
+from .singleflight import SingleFlight
+from .snapshot import (
+    SessionSnapshot,
+    SnapshotEntry,
+    capture_session,
+    decode_session,
+    open_snapshot,
+    write_snapshot,
+)
+
+logger = structlog.get_logger()
+
+
+class SessionStore:
+    """有容量上限的会话存储
+
+    按最近访问顺序（LRU）保存会话，会话数或估算内存超过上限时淘汰最久未访问的会话，
+    并由后台任务定期清理过期会话。
+
+    配置快照路径时，会话定期及关闭时保存到快照文件。启动时只读取快照索引，
+    会话在首次访问时才从快照中加载，进程重启后可以立即提供服务。
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        max_bytes: int = 512 * 1024 * 1024,
+        sweep_interval: float = 60.0,
+        snapshot_path: Optional[str] = None,
+        snapshot_interval: float = 300.0,
+    ):
+        """初始化会话存储
+
+        Args:
+            max_sessions: 最大会话数
+            max_bytes: 所有会话估算内存的上限（字节）
+            sweep_interval: 后台清理过期会话的间隔（秒）
+            snapshot_path: 会话快照文件路径，为None时不保存快照
+            snapshot_interval: 定期保存快照的间隔（秒）
+        """
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self._sessions: "OrderedDict[str, SearchSession]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._total_bytes = 0
+        # 仍在写入视频、字幕或总结的会话，不会被淘汰或过期清理
+        self._pinned: Set[str] = set()
+        self._sweeper: Optional[asyncio.Task] = None
+        self._saver: Optional[asyncio.Task] = None
+        # 快照中尚未加载的会话
+        self._snapshot: Optional[SessionSnapshot] = None
+        self._unloaded: Dict[str, SnapshotEntry] = {}
+        self._restores = SingleFlight()
+        self.expired_count = 0
+        self.evicted_count = 0
+        self.restored_count = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions or session_id in self._unloaded
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._sessions))
+
+    def __setitem__(self, session_id: str, session: SearchSession) -> None:
+        self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        self.refresh(session)
+
+    def get(self, session_id: str) -> Optional[SearchSession]:
+        """获取已加载的会话并标记为最近使用，不会从快照加载
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            Optional[SearchSession]: 会话实例，不存在时返回None
+        """
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    async def get_or_restore(self, session_id: str) -> Optional[SearchSession]:
+        """获取会话，会话尚未从快照加载时先加载
+
+        解压和重建索引在线程池中执行，不阻塞事件循环；同一会话的并发访问只加载一次。
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            Optional[SearchSession]: 会话实例，不存在、已过期或加载失败时返回None
+        """
+        session = self.get(session_id)
+        if session is not None or session_id not in self._unloaded:
+            return session
+        return await self._restores.do(session_id, lambda: self._restore(session_id))
+
+    async def _restore(self, session_id: str) -> Optional[SearchSession]:
+        """从快照中加载会话
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            Optional[SearchSession]: 会话实例，已过期或加载失败时返回None
+        """
+        entry = self._unloaded[session_id]
+        if entry.is_expired():
+            self.pop(session_id)
+            self.expired_count += 1
+            return None
+        # 在事件循环中复制压缩数据块，保存快照时可能关闭旧的文件映射
+        blob = self._snapshot.raw(session_id)
+        try:
+            session = await asyncio.get_running_loop().run_in_executor(
+                None, decode_session, blob)
+        except Exception as e:
+            self._unloaded.pop(session_id, None)
+            logger.error("session_restore_failed",
+                         session_id=session_id,
+                         error=str(e),
+                         exc_info=True)
+            return None
+        if session_id not in self._unloaded:
+            # 加载期间会话已被删除
+            return None
+        del self._unloaded[session_id]
+        self[session_id] = session
+        self.restored_count += 1
+        logger.info("session_restored",
+                    session_id=session_id,
+                    videos=len(session.videos))
+        return session
+
+    def pop(self, session_id: str) -> Optional[SearchSession]:
+        """删除会话
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            Optional[SearchSession]: 被删除的会话，不存在时返回None
+        """
+        session = self._sessions.pop(session_id, None)
+        self._total_bytes -= self._sizes.pop(session_id, 0)
+        self._unloaded.pop(session_id, None)
+        self._pinned.discard(session_id)
+        return session
+
+    def pin(self, session_id: str) -> None:
+        """标记会话正在处理中，处理完成前不会被淘汰或过期清理
+
+        Args:
+            session_id: 会话ID
+        """
+        if session_id in self._sessions:
+            self._pinned.add(session_id)
+
+    def unpin(self, session_id: str) -> None:
+        """取消 pin 的标记，并按上限重新检查是否需要淘汰
+
+        Args:
+            session_id: 会话ID
+        """
+        self._pinned.discard(session_id)
+        self._enforce_limits()
+
+    def refresh(self, session: SearchSession) -> None:
+        """重新计算会话的内存占用，并在超出上限时淘汰旧会话
+
+        会话在创建后还会陆续写入视频和字幕，写入完成后应调用本方法。
+
+        Args:
+            session: 会话实例
+        """
+        if session.session_id not in self._sessions:
+            logger.warning("session_refresh_missing", session_id=session.session_id)
+            return
+        size = session.estimate_size()
+        self._total_bytes += size - self._sizes.get(session.session_id, 0)
+        self._sizes[session.session_id] = size
+        self._enforce_limits()
+
+    def _over_limits(self) -> bool:
+        return (len(self._sessions) > self.max_sessions
+                or self._total_bytes > self.max_bytes)
+
+    def _enforce_limits(self) -> None:
+        """按 LRU 顺序淘汰会话，最近使用的会话和处理中的会话始终保留"""
+        if not self._over_limits():
+            return
+        for session_id in list(self._sessions)[:-1]:
+            if not self._over_limits():
+                break
+            if session_id in self._pinned:
+                continue
+            self.pop(session_id)
+            self.evicted_count += 1
+            logger.info("session_evicted",
+                        session_id=session_id,
+                        sessions=len(self._sessions),
+                        total_bytes=self._total_bytes)
+
+    def sweep(self) -> int:
+        """清理所有过期会话
+
+        Returns:
+            int: 清理的会话数
+        """
+        expired = [
+            session_id for session_id, session in self._sessions.items()
+            if session.is_expired() and session_id not in self._pinned
+        ]
+        expired.extend(
+            session_id for session_id, entry in self._unloaded.items()
+            if entry.is_expired()
+        )
+        for session_id in expired:
+            self.pop(session_id)
+        self.expired_count += len(expired)
+        if expired:
+            logger.info("sessions_expired",
+                        count=len(expired),
+                        sessions=len(self._sessions))
+        return len(expired)
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error("session_sweep_failed", error=str(e), exc_info=True)
+
+    async def _save_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            try:
+                await self.save_snapshot()
+            except Exception as e:
+                logger.error("session_snapshot_failed", error=str(e), exc_info=True)
+
+    async def save_snapshot(self) -> int:
+        """将未过期的会话保存到快照文件
+
+        会话状态在事件循环中复制，编码和写文件在线程池中执行。
+
+        Returns:
+            int: 保存的会话数
+        """
+        if not self.snapshot_path:
+            return 0
+        captured = {
+            session_id: capture_session(session)
+            for session_id, session in self._sessions.items()
+            if not session.is_expired()
+        }
+        keep = [
+            session_id for session_id, entry in self._unloaded.items()
+            if not entry.is_expired()
+        ]
+        previous = self._snapshot
+        snapshot = await asyncio.get_running_loop().run_in_executor(
+            None, write_snapshot, self.snapshot_path, captured, previous, keep)
+        # 尚未加载的会话改为从新快照读取
+        self._snapshot = snapshot
+        self._unloaded = {
+            session_id: entry for session_id, entry in snapshot.entries.items()
+            if session_id in self._unloaded
+        }
+        if previous is not None:
+            previous.close()
+        logger.info("session_snapshot_saved",
+                    path=self.snapshot_path,
+                    sessions=len(snapshot))
+        return len(snapshot)
+
+    def _load_snapshot(self) -> None:
+        """读取快照索引，会话在首次访问时加载"""
+        snapshot = open_snapshot(self.snapshot_path)
+        if snapshot is None:
+            return
+        self._snapshot = snapshot
+        self._unloaded = {
+            session_id: entry for session_id, entry in snapshot.entries.items()
+            if session_id not in self._sessions and not entry.is_expired()
+        }
+        logger.info("session_snapshot_loaded",
+                    path=self.snapshot_path,
+                    sessions=len(self._unloaded))
+
+    def start(self) -> None:
+        """读取会话快照，启动后台过期清理和快照保存任务"""
+        loop = asyncio.get_running_loop()
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = loop.create_task(self._sweep_loop())
+        if self.snapshot_path and (self._saver is None or self._saver.done()):
+            if self._snapshot is None:
+                self._load_snapshot()
+            self._saver = loop.create_task(self._save_loop())
+
+    async def stop(self) -> None:
+        """停止后台任务，配置快照路径时保存最后一次快照"""
+        for task in (self._sweeper, self._saver):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._sweeper = self._saver = None
+        if self.snapshot_path:
+            try:
+                await self.save_snapshot()
+            except Exception as e:
+                logger.error("session_snapshot_failed", error=str(e), exc_info=True)
+        if self._snapshot is not None:
+            self._snapshot.close()
+            self._snapshot = None
+            self._unloaded = {}
+
+    def stats(self) -> Dict:
+        """获取会话存储统计信息"""
+        return {
+            "sessions": len(self._sessions),
+            "total_bytes": self._total_bytes,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "expired": self.expired_count,
+            "evicted": self.evicted_count,
+            "pinned": len(self._pinned),
+            "unloaded": len(self._unloaded),
+            "restored": self.restored_count,
+        }
@@ -0,0 +1,346 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .preprocess import PreprocessStats
+from .session import PreparedTranscript, SearchSession, render_prompt_lines
+from .transcript import CompactTranscript
+
+logger = logging.getLogger(__name__)
+
+# 文件格式：MAGIC | 索引偏移和长度（<QQ）| 各会话的压缩数据块 | 索引 JSON
+# 索引记录每个会话数据块的位置及过期判断所需的时间，启动时只解析索引
+MAGIC = b"VSSNAP1\n"
+_LOCATION = struct.Struct("<QQ")
+_HEADER_LENGTH = struct.Struct("<I")
+
+
+class SnapshotEntry(NamedTuple):
+    """快照索引中的单个会话"""
+    offset: int
+    length: int
+    last_accessed: float  # 时间戳（秒）
+    expire_after: float  # 有效期（秒）
+
+    def is_expired(self) -> bool:
+        return datetime.now().timestamp() - self.last_accessed > self.expire_after
+
+
+def capture_session(session: SearchSession) -> Tuple[Dict, List[Any]]:
+    """在事件循环中复制会话的可变状态，供其他线程编码
+
+    字幕和已有的向量不会被修改，直接引用；列表和字典做浅拷贝。
+
+    Args:
+        session: 会话实例
+
+    Returns:
+        Tuple[Dict, List[Any]]: 可 JSON 序列化的元数据和按顺序排列的二进制数据
+    """
+    transcripts = []
+    buffers: List[Any] = []
+    for video_id, transcript in session.subtitles.items():
+        transcripts.append({
+            "video_id": video_id,
+            "rows": len(transcript),
+            "offsets_type": transcript.offsets.typecode,
+        })
+        buffers.extend([
+            transcript.starts, transcript.durations, transcript.offsets,
+            transcript.text,
+        ])
+
+    vectors = None
+    if len(session.vectors):
+        matrix = session.vectors.vectors
+        vectors = {
+            "keys": [
+                [window.video_id, window.begin] for window in session.vectors.windows
+            ],
+            "dim": matrix.shape[1],
+        }
+        buffers.append(matrix)
+
+    header = {
+        "session_id": session.session_id,
+        "created_at": session.created_at.timestamp(),
+        "last_accessed": session.last_accessed.timestamp(),
+        "expire_after": session.expire_after.total_seconds(),
+        "search_keyword": session.search_keyword,
+        "window_seconds": session.window_seconds,
+        "segment_seconds": session.segment_seconds,
+        "videos": [dict(video) for video in session.videos],
+        "video_status": dict(session.video_status),
+        "overview": session.overview,
+        "summary_status": session.summary_status,
+        "video_summaries": dict(session.video_summaries),
+        "preprocess_stats": {
+            video_id: list(stats)
+            for video_id, stats in session.preprocess_stats.items()
+        },
+        "transcripts": transcripts,
+        "vectors": vectors,
+    }
+    return header, buffers
+
+
+def encode_session(header: Dict, buffers: List[Any]) -> bytes:
+    """将 capture_session 的结果编码为压缩数据块
+
+    Args:
+        header: 会话元数据
+        buffers: 二进制数据，字符串按 UTF-8 编码
+
+    Returns:
+        bytes: zlib 压缩后的数据块
+    """
+    parts = []
+    for buffer in buffers:
+        if isinstance(buffer, str):
+            data = buffer.encode("utf-8")
+            # 解码时需要知道文本的字节数
+            parts.append(_HEADER_LENGTH.pack(len(data)))
+            parts.append(data)
+        else:
+            parts.append(memoryview(buffer).cast("B"))
+    header_data = json.dumps(
+        header, ensure_ascii=False, default=_encode_value).encode("utf-8")
+    return zlib.compress(b"".join(
+        [_HEADER_LENGTH.pack(len(header_data)), header_data, *parts]))
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def decode_session(blob: bytes) -> SearchSession:
+    """由压缩数据块重建会话，字幕窗口、BM25 索引和提示词文本在这里重新构建
+
+    快照时仍在后台处理的视频和总结无法继续，标记为 failed。
+
+    Args:
+        blob: encode_session 生成的数据块
+
+    Returns:
+        SearchSession: 会话实例
+    """
+    data = memoryview(zlib.decompress(blob))
+    (header_length,) = _HEADER_LENGTH.unpack_from(data)
+    position = _HEADER_LENGTH.size + header_length
+    header = json.loads(bytes(data[_HEADER_LENGTH.size:position]).decode("utf-8"))
+
+    def read_array(typecode: str, count: int) -> array:
+        nonlocal position
+        values = array(typecode)
+        size = values.itemsize * count
+        values.frombytes(data[position:position + size])
+        position += size
+        return values
+
+    def read_text() -> str:
+        nonlocal position
+        (length,) = _HEADER_LENGTH.unpack_from(data, position)
+        position += _HEADER_LENGTH.size
+        text = bytes(data[position:position + length]).decode("utf-8")
+        position += length
+        return text
+
+    transcripts = {}
+    for item in header["transcripts"]:
+        rows = item["rows"]
+        starts = read_array("d", rows)
+        durations = read_array("d", rows)
+        offsets = read_array(item["offsets_type"], rows + 1)
+        transcripts[item["video_id"]] = CompactTranscript(
+            starts, durations, read_text(), offsets)
+
+    session = SearchSession(
+        header["session_id"],
+        window_seconds=header["window_seconds"],
+        segment_seconds=header["segment_seconds"],
+    )
+    session.created_at = datetime.fromtimestamp(header["created_at"])
+    session.last_accessed = datetime.fromtimestamp(header["last_accessed"])
+    session.expire_after = timedelta(seconds=header["expire_after"])
+    session.search_keyword = header["search_keyword"]
+
+    stats = {
+        video_id: PreprocessStats(*values)
+        for video_id, values in header["preprocess_stats"].items()
+    }
+    for video in header["videos"]:
+        video["published_at"] = datetime.fromisoformat(video["published_at"])
+        transcript = transcripts.get(video["video_id"])
+        prepared = None
+        if transcript is not None:
+            prepared = PreparedTranscript(
+                transcript,
+                render_prompt_lines(transcript),
+                stats.get(video["video_id"]),
+            )
+        session.add_prepared_video(video, prepared)
+
+    session.video_status = {
+        video_id: "failed" if status == "pending" else status
+        for video_id, status in header["video_status"].items()
+    }
+    session.overview = header["overview"]
+    summary_status = header["summary_status"]
+    session.summary_status = "failed" if summary_status == "pending" else summary_status
+    session.video_summaries = header["video_summaries"]
+
+    vectors = header["vectors"]
+    if vectors:
+        count = len(vectors["keys"])
+        matrix = np.frombuffer(
+            data, dtype=np.float32, count=count * vectors["dim"], offset=position,
+        ).reshape(count, vectors["dim"]).copy()
+        windows = {
+            (window.video_id, window.begin): window
+            for video_windows in session.windows.values() for window in video_windows
+        }
+        session.vectors.add([windows[tuple(key)] for key in vectors["keys"]], matrix)
+
+    return session
+
+
+class SessionSnapshot:
+    """只读的会话快照文件
+
+    文件通过 mmap 映射，打开时只解析索引；单个会话的数据块在 load 时才解压和反序列化。
+    """
+
+    def __init__(self, path: str):
+        """打开快照文件
+
+        Args:
+            path: 快照文件路径
+
+        Raises:
+            ValueError: 文件格式不正确
+            OSError: 文件无法读取
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if self._mmap[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not a session snapshot")
+            offset, length = _LOCATION.unpack_from(self._mmap, len(MAGIC))
+            index = json.loads(self._mmap[offset:offset + length].decode("utf-8"))
+        except Exception:
+            self._mmap.close()
+            raise
+        self.entries: Dict[str, SnapshotEntry] = {
+            session_id: SnapshotEntry(*values) for session_id, values in index.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def raw(self, session_id: str) -> bytes:
+        """读取会话的压缩数据块"""
+        entry = self.entries[session_id]
+        return self._mmap[entry.offset:entry.offset + entry.length]
+
+    def load(self, session_id: str) -> SearchSession:
+        """反序列化单个会话
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            SearchSession: 会话实例
+        """
+        return decode_session(self.raw(session_id))
+
+    def close(self) -> None:
+        """关闭文件映射"""
+        self._mmap.close()
+
+
+# 周期保存和关闭时的保存可能同时在线程池中执行，写文件时串行化
+_write_lock = threading.Lock()
+
+
+def write_snapshot(
+    path: str,
+    captured: Dict[str, Tuple[Dict, List[Any]]],
+    previous: Optional[SessionSnapshot] = None,
+    keep: Iterable[str] = (),
+) -> SessionSnapshot:
+    """编码会话并原子地写入快照文件：先写临时文件，完成后替换
+
+    在线程池中调用。尚未加载的会话直接从旧快照复制压缩数据块，无需解码。
+
+    Args:
+        path: 快照文件路径
+        captured: 会话ID -> capture_session 的结果
+        previous: 旧快照
+        keep: 需要从旧快照复制的会话ID
+
+    Returns:
+        SessionSnapshot: 新快照
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with _write_lock:
+        temp_path = f"{path}.tmp"
+        index = {}
+        with open(temp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(_LOCATION.pack(0, 0))
+            for session_id, (header, buffers) in captured.items():
+                blob = encode_session(header, buffers)
+                index[session_id] = [
+                    f.tell(), len(blob),
+                    header["last_accessed"], header["expire_after"],
+                ]
+                f.write(blob)
+            if previous is not None:
+                for session_id in keep:
+                    entry = previous.entries[session_id]
+                    index[session_id] = [
+                        f.tell(), entry.length, entry.last_accessed, entry.expire_after,
+                    ]
+                    f.write(previous.raw(session_id))
+            index_data = json.dumps(index).encode("utf-8")
+            offset = f.tell()
+            f.write(index_data)
+            f.seek(len(MAGIC))
+            f.write(_LOCATION.pack(offset, len(index_data)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        return SessionSnapshot(path)
+
+
+def open_snapshot(path: str) -> Optional[SessionSnapshot]:
+    """打开快照文件，文件不存在或损坏时返回None
+
+    Args:
+        path: 快照文件路径
+
+    Returns:
+        Optional[SessionSnapshot]: 快照实例
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        return SessionSnapshot(path)
+    except (ValueError, OSError, struct.error) as e:
+        logger.error(f"Failed to open session snapshot {path}: {str(e)}")
+        return None
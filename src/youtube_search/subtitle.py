@@ -1,9 +1,17 @@
 import logging
 import asyncio
-from typing import Optional, Dict, List
-from youtube_transcript_api import YouTubeTranscriptApi
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Optional, Dict, List
+import requests
+from youtube_transcript_api import (
+    TooManyRequests, Transcript, YouTubeRequestFailed, YouTubeTranscriptApi)
 from functools import partial
 
+from .metrics import track_stage
+from .resilience import CircuitBreaker, CircuitOpenError, create_circuit_breaker
+from .singleflight import SingleFlight
+from .transcript_cache import TranscriptCache
+
 logger = logging.getLogger(__name__)
 
 
@@ -17,20 +25,201 @@ def get_proxy() -> Dict[str, str]:
     return {}
 
 
+def is_upstream_failure(error: BaseException) -> bool:
+    """网络错误和 YouTube 请求失败计入熔断，视频无字幕等情况不计入"""
+    return isinstance(
+        error, (requests.RequestException, YouTubeRequestFailed, TooManyRequests))
+
+
+def select_transcript(
+    transcripts: Iterable[Transcript],
+    prefer_language: Optional[str] = None,
+) -> Optional[Transcript]:
+    """按优先级选择字幕轨道：人工字幕 > 自动生成字幕
+
+    有人工字幕时只在人工字幕中选择，首选语言可用时取首选语言，否则取第一条；
+    没有人工字幕时同样规则应用于自动生成字幕。翻译字幕都基于已有轨道，
+    没有任何轨道时也就没有可翻译的字幕，因此无需单独处理。
+
+    Args:
+        transcripts: 视频的字幕轨道列表
+        prefer_language: 首选语言代码
+
+    Returns:
+        Optional[Transcript]: 选中的字幕轨道，没有任何字幕时返回None
+    """
+    tracks = list(transcripts)
+    for group in (
+        [track for track in tracks if not track.is_generated],
+        [track for track in tracks if track.is_generated],
+    ):
+        if not group:
+            continue
+        for track in group:
+            if track.language_code == prefer_language:
+                return track
+        return group[0]
+    return None
+
+
 class SubtitleFetcher:
     """YouTube字幕获取器"""
 
-    def __init__(self, proxy: Optional[Dict[str, str]] = None):
+    def __init__(
+        self,
+        proxy: Optional[Dict[str, str]] = None,
+        cache: Optional[TranscriptCache] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        max_workers: int = 8,
+    ):
         """初始化字幕获取器
 
         Args:
             proxy: 代理配置，默认为None
+            cache: 持久化字幕缓存，为None时不使用缓存
+            breaker: 熔断器，为None时按环境变量创建
+            max_workers: 同时进行的字幕下载数，即专用线程池大小
         """
         self.proxy = proxy or get_proxy()
-        self._loop = asyncio.get_event_loop()
+        self.cache = cache
+        self.max_workers = max_workers
+        # 专用线程池，阻塞的字幕下载不占用事件循环的默认线程池
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="transcript")
+        # 在事件循环内延迟创建，避免绑定到构造时的事件循环
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self._flights = SingleFlight()
+        self.breaker = breaker or create_circuit_breaker(
+            "transcripts", is_failure=is_upstream_failure)
+
+    async def _run_blocking(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        **kwargs: Any,
+    ) -> Any:
+        """在专用线程池中执行阻塞调用，超过并发上限时在事件循环内排队
+
+        排队发生在信号量上而不是线程池的内部队列中，因此可以统计队列深度，
+        等待中的调用被取消时也不会留下积压的任务。
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+
+        self.queued += 1
+        try:
+            with track_stage("transcript_queue_wait"):
+                await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        self.active += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, partial(fn, *args, **kwargs))
+        finally:
+            self.active -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict:
+        """获取字幕下载线程池统计信息"""
+        return {
+            "max_workers": self.max_workers,
+            "active": self.active,
+            "queued": self.queued,
+            "completed": self.completed,
+        }
+
+    async def close(self) -> None:
+        """等待进行中的下载完成后关闭线程池和字幕缓存"""
+        await asyncio.get_running_loop().run_in_executor(
+            None, partial(self._executor.shutdown, wait=True))
+        if self.cache:
+            self.cache.close()
 
     async def get_transcript(self, video_id: str, prefer_language: str = None) -> Optional[List[Dict]]:
-        """异步获取视频字幕，按优先级获取：人工字幕 > 自动生成字幕 > 翻译字幕
+        """异步获取视频字幕，优先从缓存读取，未命中时从 YouTube 下载并写入缓存；
+        同一视频的并发请求合并为一次
+
+        Args:
+            video_id: YouTube视频ID
+            prefer_language: 首选语言代码，默认为None
+
+        Returns:
+            Optional[List[Dict]]: 字幕数据列表，每项包含text、start和duration，
+                获取失败返回None
+        """
+        return await self._flights.do(
+            (video_id, prefer_language or ""),
+            lambda: self._get_transcript(video_id, prefer_language))
+
+    async def _get_transcript(
+        self,
+        video_id: str,
+        prefer_language: str = None,
+    ) -> Optional[List[Dict]]:
+        """先查缓存、再下载字幕并写入缓存"""
+        language = prefer_language or ""
+        if self.cache:
+            try:
+                cached = await asyncio.get_running_loop().run_in_executor(
+                    None, self.cache.get, video_id, language)
+                if cached is not None:
+                    return cached
+            except Exception as e:
+                logger.error(
+                    f"Error reading transcript cache for video {video_id}: {str(e)}")
+
+        transcript = await self._download_transcript(video_id, prefer_language)
+
+        if transcript and self.cache:
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.cache.set, video_id, language, transcript)
+            except Exception as e:
+                logger.error(
+                    f"Error writing transcript cache for video {video_id}: {str(e)}")
+
+        return transcript
+
+    def _fetch_transcript(
+        self,
+        video_id: str,
+        prefer_language: Optional[str],
+    ) -> Optional[List[Dict]]:
+        """列出视频的字幕轨道，直接下载选中的轨道（阻塞调用，在线程池中执行）
+
+        复用已获取的轨道列表下载字幕，不再经由 YouTubeTranscriptApi.get_transcript
+        重新请求一次视频页面。
+
+        Args:
+            video_id: YouTube视频ID
+            prefer_language: 首选语言代码
+
+        Returns:
+            Optional[List[Dict]]: 字幕数据列表，没有可用字幕时返回None
+        """
+        with track_stage("list_transcripts"):
+            transcripts = YouTubeTranscriptApi.list_transcripts(
+                video_id, proxies=self.proxy)
+
+        transcript = select_transcript(transcripts, prefer_language)
+        if transcript is None:
+            return None
+
+        with track_stage("get_transcript"):
+            return transcript.fetch()
+
+    async def _download_transcript(
+        self,
+        video_id: str,
+        prefer_language: str = None,
+    ) -> Optional[List[Dict]]:
+        """从 YouTube 下载视频字幕，按优先级获取：人工字幕 > 自动生成字幕
 
         Args:
             video_id: YouTube视频ID
@@ -40,48 +229,17 @@ class SubtitleFetcher:
             Optional[List[Dict]]: 字幕数据列表，每项包含text、start和duration，获取失败返回None
         """
         try:
-            # 在线程池中执行阻塞操作
-            transcripts = await self._loop.run_in_executor(
-                None,
-                partial(YouTubeTranscriptApi.list_transcripts,
-                        video_id, proxies=self.proxy)
-            )
-
-            # 获取可用的语言列表（按优先级）
-            language_codes = []
-
-            # 1. 优先获取人工生成的字幕
-            for key in transcripts._manually_created_transcripts:
-                language_codes.append(key)
-
-            # 2. 如果没有人工字幕，获取自动生成的字幕
-            if not language_codes:
-                for key in transcripts._generated_transcripts:
-                    language_codes.append(key)
-
-            # 3. 如果还是没有，获取可翻译的语言
-            if not language_codes:
-                for key in transcripts._translation_languages:
-                    language_codes.append(key)
-
-            if not language_codes:
+            # 列出字幕轨道、选择并下载在同一个线程池任务中完成
+            transcript = await self.breaker.call(
+                lambda: self._run_blocking(
+                    self._fetch_transcript, video_id, prefer_language))
+            if transcript is None:
                 logger.warning(f"No subtitles available for video {video_id}")
-                return None
-
-            # 如果指定了首选语言且可用，将其放在语言列表首位
-            if prefer_language and prefer_language in language_codes:
-                language_codes.remove(prefer_language)
-                language_codes.insert(0, prefer_language)
-
-            # 异步获取字幕
-            return await self._loop.run_in_executor(
-                None,
-                partial(YouTubeTranscriptApi.get_transcript,
-                        video_id=video_id,
-                        languages=language_codes,
-                        proxies=self.proxy)
-            )
+            return transcript
 
+        except CircuitOpenError as e:
+            logger.warning(f"Skipping transcript for video {video_id}: {str(e)}")
+            return None
         except Exception as e:
             logger.error(
                 f"Error getting transcript for video {video_id}: {str(e)}")
@@ -0,0 +1,320 @@
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional, Sequence
+
+import structlog
+
+from .openai_client import OpenAIClient
+from .preprocess import estimate_tokens
+from .session import SearchSession
+
+logger = structlog.get_logger()
+
+
+def chunk_lines(lines: Sequence[str], max_tokens: int) -> List[str]:
+    """将文本行按 token 预算合并为若干块
+
+    Args:
+        lines: 文本行列表
+        max_tokens: 每块的最大 token 数，单行超出预算时独占一块
+
+    Returns:
+        List[str]: 文本块列表
+    """
+    chunks = []
+    current: List[str] = []
+    current_tokens = 0
+    for line in lines:
+        tokens = estimate_tokens(line) + 1
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n".join(current))
+            current = []
+            current_tokens = 0
+        current.append(line)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """截断文本使估算 token 数不超过预算"""
+    tokens = estimate_tokens(text)
+    while text and tokens > max_tokens:
+        text = text[:max(0, int(len(text) * max_tokens / tokens) - 1)]
+        tokens = estimate_tokens(text)
+    return text
+
+
+class TranscriptSummarizer:
+    """按 token 预算分块的 map-reduce 字幕总结器"""
+
+    def __init__(
+        self,
+        openai_client: OpenAIClient,
+        chunk_tokens: int = 3000,
+        summary_tokens: int = 200,
+        concurrency: int = 4,
+    ):
+        """初始化总结器
+
+        Args:
+            openai_client: OpenAI 客户端
+            chunk_tokens: 每次总结请求的输入 token 预算
+            summary_tokens: 分块和单视频总结的最大输出 token 数
+            concurrency: 单次总结（一个会话或一批会话）同时进行的总结请求数
+
+        Raises:
+            ValueError: chunk_tokens 不足以容纳两段分块总结，合并无法收敛
+        """
+        if chunk_tokens <= 2 * summary_tokens:
+            raise ValueError(
+                f"chunk_tokens ({chunk_tokens}) must be greater than "
+                f"2 * summary_tokens ({summary_tokens})")
+        self.openai_client = openai_client
+        self.chunk_tokens = chunk_tokens
+        self.summary_tokens = summary_tokens
+        self.concurrency = concurrency
+
+    def _limiter(
+        self,
+        semaphore: Optional[asyncio.Semaphore] = None,
+    ) -> asyncio.Semaphore:
+        """每次总结调用使用独立的并发限制，避免并发请求相互排队"""
+        return semaphore or asyncio.Semaphore(self.concurrency)
+
+    async def _summarize(
+        self,
+        text: str,
+        max_tokens: int,
+        semaphore: asyncio.Semaphore,
+    ) -> str:
+        """在并发限制内调用 LLM 总结一段文本"""
+        async with semaphore:
+            return await self.openai_client.generate_video_sumary(
+                transcript=text,
+                max_tokens=max_tokens
+            )
+
+    async def _reduce_to_chunk(
+        self,
+        texts: List[str],
+        semaphore: asyncio.Semaphore,
+    ) -> str:
+        """逐层分块合并多段总结，直到剩余内容不超过一次请求的预算
+
+        分块总结超出预期长度导致块数不再减少时，按比例截断各段总结后合并为一块。
+
+        Args:
+            texts: 待合并的总结列表
+            semaphore: 本次总结的并发限制
+
+        Returns:
+            str: 可在一次请求内完成最终总结的文本
+        """
+        chunks = chunk_lines(texts, self.chunk_tokens)
+        while len(chunks) > 1:
+            partials = await asyncio.gather(*[
+                self._summarize(chunk, self.summary_tokens, semaphore)
+                for chunk in chunks
+            ])
+            partials = [p for p in partials if p]
+            new_chunks = chunk_lines(partials, self.chunk_tokens)
+            if len(new_chunks) >= len(chunks):
+                logger.warning("summary_reduce_truncated",
+                               chunks=len(chunks),
+                               partials=len(partials))
+                budget = max(1, self.chunk_tokens // len(partials) - 1)
+                return "\n".join(truncate_tokens(p, budget) for p in partials)
+            chunks = new_chunks
+        return chunks[0] if chunks else ""
+
+    async def _reduce(
+        self,
+        texts: List[str],
+        max_tokens: int,
+        semaphore: asyncio.Semaphore,
+    ) -> str:
+        """合并多段总结
+
+        Args:
+            texts: 待合并的总结列表
+            max_tokens: 最终总结的最大输出 token 数
+            semaphore: 本次总结的并发限制
+
+        Returns:
+            str: 合并后的总结
+        """
+        chunk = await self._reduce_to_chunk(texts, semaphore)
+        if not chunk:
+            return ""
+        return await self._summarize(chunk, max_tokens, semaphore)
+
+    async def summarize_video(
+        self,
+        title: str,
+        subtitles: List[Dict],
+        semaphore: Optional[asyncio.Semaphore] = None,
+    ) -> str:
+        """总结单个视频的字幕
+
+        Args:
+            title: 视频标题
+            subtitles: 字幕列表
+            semaphore: 并发限制，为None时单独创建
+
+        Returns:
+            str: 视频内容总结
+        """
+        semaphore = self._limiter(semaphore)
+        lines = [sub.get("text", "") for sub in subtitles]
+        chunks = chunk_lines(lines, self.chunk_tokens)
+        partials = await asyncio.gather(*[
+            self._summarize(f"[{title}]\n{chunk}", self.summary_tokens, semaphore)
+            for chunk in chunks
+        ])
+        if len(partials) == 1:
+            return partials[0]
+        return await self._reduce(
+            [f"[{title}] {p}" for p in partials if p], self.summary_tokens, semaphore)
+
+    async def summarize_videos(
+        self,
+        sessions: Sequence[SearchSession],
+        semaphore: Optional[asyncio.Semaphore] = None,
+    ) -> None:
+        """总结会话中尚未总结的视频，结果缓存在会话上
+
+        多个会话包含同一视频时（共享同一份字幕）只总结一次，结果写入所有这些会话。
+
+        Args:
+            sessions: 会话实例
+            semaphore: 并发限制，为None时单独创建
+        """
+        semaphore = self._limiter(semaphore)
+        titles: Dict[str, str] = {}
+        pending: Dict[str, List[SearchSession]] = {}
+        for session in sessions:
+            for video in session.videos:
+                titles.setdefault(video["video_id"], video.get("title", ""))
+            for video_id in session.subtitles:
+                if video_id not in session.video_summaries:
+                    pending.setdefault(video_id, []).append(session)
+
+        async def summarize(video_id: str, video_sessions: List[SearchSession]) -> None:
+            try:
+                summary = await self.summarize_video(
+                    titles.get(video_id, ""),
+                    video_sessions[0].subtitles[video_id],
+                    semaphore)
+            except Exception as e:
+                logger.warning("summarize_video_failed",
+                               session_ids=[
+                                   session.session_id for session in video_sessions],
+                               video_id=video_id,
+                               error=str(e))
+                return
+            for session in video_sessions:
+                session.video_summaries[video_id] = summary
+
+        await asyncio.gather(*[
+            summarize(video_id, video_sessions)
+            for video_id, video_sessions in pending.items()
+        ])
+
+    async def _summarize_videos(
+        self,
+        session: SearchSession,
+        semaphore: asyncio.Semaphore,
+    ) -> List[str]:
+        """总结会话中尚未总结的视频，结果缓存在会话上
+
+        Args:
+            session: 会话实例
+            semaphore: 本次总结的并发限制
+
+        Returns:
+            List[str]: 已有总结的视频ID列表，按会话中的字幕顺序
+        """
+        await self.summarize_videos([session], semaphore)
+
+        return [
+            video_id for video_id in session.subtitles
+            if session.video_summaries.get(video_id)
+        ]
+
+    def _titled_summaries(
+        self,
+        session: SearchSession,
+        video_ids: List[str],
+    ) -> List[str]:
+        """为单视频总结加上视频标题，作为合并阶段的输入"""
+        titles = {video["video_id"]: video.get("title", "") for video in session.videos}
+        return [
+            f"[{titles.get(video_id, '')}] {session.video_summaries[video_id]}"
+            for video_id in video_ids
+        ]
+
+    async def summarize_session(
+        self,
+        session: SearchSession,
+        max_tokens: int = 300,
+    ) -> str:
+        """总结会话中的所有视频，单视频总结缓存在会话上供后续复用
+
+        Args:
+            session: 会话实例
+            max_tokens: 总体总结的最大输出 token 数
+
+        Returns:
+            str: 总体总结，没有可用字幕或总结失败时返回空字符串
+        """
+        semaphore = self._limiter()
+        video_ids = await self._summarize_videos(session, semaphore)
+        if not video_ids:
+            return ""
+        if len(video_ids) == 1:
+            return session.video_summaries[video_ids[0]]
+
+        try:
+            return await self._reduce(
+                self._titled_summaries(session, video_ids), max_tokens, semaphore)
+        except Exception as e:
+            logger.warning("summarize_session_failed",
+                           session_id=session.session_id,
+                           error=str(e))
+            return ""
+
+    async def stream_session_summary(
+        self,
+        session: SearchSession,
+        max_tokens: int = 300
+    ) -> AsyncIterator[str]:
+        """与 summarize_session 相同，但最终的合并总结以流式返回
+
+        Args:
+            session: 会话实例
+            max_tokens: 总体总结的最大输出 token 数
+
+        Yields:
+            str: 总结的文本片段
+        """
+        semaphore = self._limiter()
+        video_ids = await self._summarize_videos(session, semaphore)
+        if not video_ids:
+            return
+        if len(video_ids) == 1:
+            yield session.video_summaries[video_ids[0]]
+            return
+
+        try:
+            chunk = await self._reduce_to_chunk(
+                self._titled_summaries(session, video_ids), semaphore)
+            if not chunk:
+                return
+            async for delta in self.openai_client.stream_video_summary(
+                    chunk, max_tokens=max_tokens):
+                yield delta
+        except Exception as e:
+            logger.warning("summarize_session_failed",
+                           session_id=session.session_id,
+                           error=str(e))
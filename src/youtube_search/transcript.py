@@ -0,0 +1,117 @@
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Sequence, Tuple, Union
+
+
+class CompactTranscript(Sequence):
+    """列式存储的视频字幕
+
+    开始时间和时长分别存放在 array('d') 中，所有字幕文本拼接为一个字符串并用偏移量定位，
+    避免每行字幕一个 dict 的内存开销。按下标访问时仍返回包含 text、start、duration
+    的 dict，与原始字幕格式兼容。
+    """
+
+    __slots__ = ("starts", "durations", "_text", "_offsets")
+
+    def __init__(
+        self,
+        starts: array,
+        durations: array,
+        text: str,
+        offsets: array,
+    ):
+        """初始化列式字幕
+
+        Args:
+            starts: 每行字幕的开始时间（秒），按升序排列
+            durations: 每行字幕的时长（秒）
+            text: 所有字幕文本拼接后的字符串
+            offsets: 每行文本在 text 中的起始位置，长度为行数 + 1
+        """
+        self.starts = starts
+        self.durations = durations
+        self._text = text
+        self._offsets = offsets
+
+    @classmethod
+    def from_subtitles(cls, subtitles: Sequence[Dict]) -> "CompactTranscript":
+        """由 youtube_transcript_api 格式的字幕列表构建
+
+        Args:
+            subtitles: 字幕列表，每项包含 text、start 和 duration
+
+        Returns:
+            CompactTranscript: 列式字幕
+        """
+        ordered = sorted(subtitles, key=lambda sub: sub.get("start", 0))
+        texts = [sub.get("text", "") for sub in ordered]
+        offsets = array("L", [0])
+        for text in texts:
+            offsets.append(offsets[-1] + len(text))
+        return cls(
+            starts=array("d", (float(sub.get("start", 0)) for sub in ordered)),
+            durations=array("d", (float(sub.get("duration", 0)) for sub in ordered)),
+            text="".join(texts),
+            offsets=offsets,
+        )
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @property
+    def text(self) -> str:
+        """所有字幕文本拼接后的字符串"""
+        return self._text
+
+    @property
+    def offsets(self) -> array:
+        """每行文本在 text 中的起始位置，长度为行数 + 1"""
+        return self._offsets
+
+    def text_at(self, i: int) -> str:
+        """获取第 i 行字幕文本"""
+        return self._text[self._offsets[i]:self._offsets[i + 1]]
+
+    def join_text(self, begin: int, end: int, sep: str = " ") -> str:
+        """拼接 [begin, end) 行的字幕文本"""
+        return sep.join(self.text_at(i) for i in range(begin, end))
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[Dict, List[Dict]]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("transcript index out of range")
+        return {
+            "text": self.text_at(i),
+            "start": self.starts[i],
+            "duration": self.durations[i],
+        }
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def index_range(self, start: float, end: float) -> Tuple[int, int]:
+        """二分查找开始时间位于 [start, end) 内的字幕行
+
+        Args:
+            start: 起始时间（秒）
+            end: 结束时间（秒，不含）
+
+        Returns:
+            Tuple[int, int]: 行下标范围 [begin, end)
+        """
+        return bisect_left(self.starts, start), bisect_left(self.starts, end)
+
+    @property
+    def nbytes(self) -> int:
+        """估算占用的内存（字节）"""
+        return (
+            sys.getsizeof(self._text)
+            + self.starts.itemsize * len(self.starts)
+            + self.durations.itemsize * len(self.durations)
+            + self._offsets.itemsize * len(self._offsets)
+        )
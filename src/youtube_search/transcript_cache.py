@@ -0,0 +1,203 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptCache:
+    """基于 SQLite 的持久化字幕缓存
+
+    以 (video_id, language) 为键存储压缩后的字幕数据，支持过期时间（TTL）、
+    按最近访问时间的 LRU 淘汰以及命中/未命中统计。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float = 7 * 24 * 3600,
+        max_entries: int = 10000,
+        max_bytes: int = 512 * 1024 * 1024,
+    ):
+        """初始化字幕缓存
+
+        Args:
+            path: SQLite 数据库文件路径
+            ttl: 缓存有效期（秒）
+            max_entries: 最大缓存条目数
+            max_bytes: 缓存数据（压缩后）的最大总字节数
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS transcripts (
+                video_id TEXT NOT NULL,
+                language TEXT NOT NULL,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (video_id, language)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transcripts_accessed "
+            "ON transcripts (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, video_id: str, language: str = "") -> Optional[List[Dict]]:
+        """读取缓存的字幕
+
+        Args:
+            video_id: YouTube视频ID
+            language: 首选语言代码，未指定时为空字符串
+
+        Returns:
+            Optional[List[Dict]]: 字幕数据列表，未命中或已过期返回None
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, created_at FROM transcripts "
+                "WHERE video_id = ? AND language = ?",
+                (video_id, language),
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            data, created_at = row
+            if now - created_at > self.ttl:
+                self._conn.execute(
+                    "DELETE FROM transcripts WHERE video_id = ? AND language = ?",
+                    (video_id, language),
+                )
+                self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE transcripts SET accessed_at = ? "
+                "WHERE video_id = ? AND language = ?",
+                (now, video_id, language),
+            )
+            self._conn.commit()
+            self.hits += 1
+
+        return json.loads(zlib.decompress(data))
+
+    def set(self, video_id: str, language: str, transcript: List[Dict]) -> None:
+        """写入字幕缓存，并在超出容量时淘汰最久未访问的条目
+
+        Args:
+            video_id: YouTube视频ID
+            language: 首选语言代码，未指定时为空字符串
+            transcript: 字幕数据列表
+        """
+        data = zlib.compress(
+            json.dumps(transcript, ensure_ascii=False).encode("utf-8")
+        )
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transcripts "
+                "(video_id, language, data, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (video_id, language, data, len(data), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """按 LRU 顺序淘汰条目，直到满足条目数和字节数上限（需持有锁）"""
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcripts"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute(
+            "SELECT video_id, language, size FROM transcripts "
+            "ORDER BY accessed_at ASC"
+        ).fetchall()
+        for video_id, language, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._conn.execute(
+                "DELETE FROM transcripts WHERE video_id = ? AND language = ?",
+                (video_id, language),
+            )
+            count -= 1
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        """获取缓存统计信息"""
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcripts"
+            ).fetchone()
+        return {
+            "entries": count,
+            "bytes": total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+def create_transcript_cache() -> Optional[TranscriptCache]:
+    """根据环境变量创建字幕缓存
+
+    环境变量:
+        TRANSCRIPT_CACHE_ENABLED: 设为 false/0 时关闭缓存
+        TRANSCRIPT_CACHE_PATH: 缓存数据库路径
+        TRANSCRIPT_CACHE_TTL: 缓存有效期（秒）
+        TRANSCRIPT_CACHE_MAX_ENTRIES: 最大缓存条目数
+        TRANSCRIPT_CACHE_MAX_BYTES: 缓存最大字节数
+
+    Returns:
+        Optional[TranscriptCache]: 字幕缓存实例，关闭或创建失败时返回None
+    """
+    if os.getenv("TRANSCRIPT_CACHE_ENABLED", "true").lower() in ("false", "0", "no"):
+        return None
+
+    try:
+        return TranscriptCache(
+            path=os.getenv("TRANSCRIPT_CACHE_PATH", ".cache/transcripts.db"),
+            ttl=float(os.getenv("TRANSCRIPT_CACHE_TTL", 7 * 24 * 3600)),
+            max_entries=int(os.getenv("TRANSCRIPT_CACHE_MAX_ENTRIES", 10000)),
+            max_bytes=int(
+                os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+            ),
+        )
+    except (sqlite3.Error, OSError) as e:
+        logger.error(f"Failed to open transcript cache: {str(e)}")
+        return None
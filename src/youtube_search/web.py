@@ -1,20 +1,55 @@
 import os
+import json
+import math
 import structlog
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional, Tuple
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
 
-from .models import SearchRequest, SearchResponse, SessionAnalysisRequest, SessionAnalysisResponse, VideoClip
+from .corpus import CorpusDisabledError
+from .metrics import StatsCollector
+from .resilience import CircuitOpenError, DeadlineExceeded, request_deadline
+from .models import (
+    BatchSearchRequest, BatchSearchResponse, CorpusSearchResponse, SearchRequest,
+    SearchResponse, SessionAnalysisRequest, SessionAnalysisResponse, SessionStatus,
+    VideoClip,
+)
 from .service import YouTubeService
 
 logger = structlog.get_logger()
 
+# 单个请求的总时间预算（秒），传递到服务层及所有上游调用和重试
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", 60))
+
+
+def _unavailable(e: CircuitOpenError) -> HTTPException:
+    """上游熔断时返回 503，并通过 Retry-After 提示客户端重试时间"""
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动后台任务，关闭时释放服务资源"""
+    await youtube_service.start()
+    yield
+    await youtube_service.close()
+
+
 # 初始化 FastAPI 应用
 app = FastAPI(
     title="YouTube Video Search API",
     description="Search and analyze YouTube videos",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 添加 CORS 中间件
@@ -28,6 +63,8 @@ app.add_middleware(
 
 # 初始化服务
 youtube_service = YouTubeService()
+# 会话、缓存等状态在抓取时读取，不在请求路径上更新指标
+REGISTRY.register(StatsCollector(youtube_service.metrics_sources()))
 
 
 @app.post("/search", response_model=SearchResponse)
@@ -36,18 +73,32 @@ async def search_videos(request: SearchRequest) -> SearchResponse:
     try:
         logger.info("search_request_received",
                     keyword=request.keyword,
-                    max_results=request.max_results)
+                    max_results=request.max_results,
+                    background=request.background)
 
-        result = await youtube_service.search_videos(
-            keyword=request.keyword,
-            max_results=request.max_results
-        )
+        with request_deadline(REQUEST_TIMEOUT):
+            result = await youtube_service.search_videos(
+                keyword=request.keyword,
+                max_results=request.max_results,
+                background=request.background,
+                wait_for_subtitles=request.wait_for_subtitles
+            )
 
         logger.info("search_completed",
                     keyword=request.keyword,
                     total_videos=len(result.videos))
         return result
 
+    except CircuitOpenError as e:
+        logger.warning("search_failed_upstream_unavailable",
+                       keyword=request.keyword,
+                       error=str(e))
+        raise _unavailable(e)
+    except DeadlineExceeded as e:
+        logger.warning("search_failed_deadline_exceeded",
+                       keyword=request.keyword,
+                       error=str(e))
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error("search_failed",
                      keyword=request.keyword,
@@ -56,6 +107,68 @@ async def search_videos(request: SearchRequest) -> SearchResponse:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/search/batch", response_model=BatchSearchResponse)
+async def search_videos_batch(request: BatchSearchRequest) -> BatchSearchResponse:
+    """批量搜索视频，每个关键词创建一个会话，视频元数据和字幕在关键词间去重共享"""
+    try:
+        logger.info("batch_search_request_received",
+                    keywords=len(request.keywords),
+                    max_results=request.max_results,
+                    background=request.background)
+
+        with request_deadline(REQUEST_TIMEOUT):
+            result = await youtube_service.search_videos_batch(
+                keywords=request.keywords,
+                max_results=request.max_results,
+                background=request.background
+            )
+
+        logger.info("batch_search_completed",
+                    sessions=len(result.results),
+                    unique_videos=result.unique_videos)
+        return result
+
+    except CircuitOpenError as e:
+        logger.warning("batch_search_failed_upstream_unavailable", error=str(e))
+        raise _unavailable(e)
+    except DeadlineExceeded as e:
+        logger.warning("batch_search_failed_deadline_exceeded", error=str(e))
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.error("batch_search_failed", error=str(e), exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _sse_response(events: AsyncIterator[Tuple[str, Any]]) -> StreamingResponse:
+    """将 (事件名, 事件数据) 流编码为 Server-Sent Events 响应
+
+    事件流在响应发送时才开始执行，因此请求截止时间在这里设置。
+    """
+    async def encode() -> AsyncIterator[str]:
+        with request_deadline(REQUEST_TIMEOUT):
+            async for event, data in events:
+                payload = json.dumps(jsonable_encoder(data), ensure_ascii=False)
+                yield f"event: {event}\ndata: {payload}\n\n"
+
+    return StreamingResponse(
+        encode(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/search/stream")
+async def search_videos_stream(request: SearchRequest) -> StreamingResponse:
+    """搜索视频并创建会话，以 SSE 流式返回视频、字幕状态和总结"""
+    logger.info("search_stream_request_received",
+                keyword=request.keyword,
+                max_results=request.max_results)
+    return _sse_response(youtube_service.search_videos_stream(
+        keyword=request.keyword,
+        max_results=request.max_results
+    ))
+
+
 @app.get("/health")
 async def health_check() -> dict:
     """健康检查接口"""
@@ -63,6 +176,53 @@ async def health_check() -> dict:
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def metrics() -> Response:
+    """Prometheus 指标
+
+    各阶段耗时直方图、错误数、LLM token 用量及重试次数、会话和缓存状态
+    """
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/sessions/stats")
+async def session_stats() -> dict:
+    """会话存储统计：会话数、估算内存及过期/淘汰次数"""
+    return youtube_service.sessions.stats()
+
+
+@app.get("/sessions/{session_id}", response_model=SessionStatus)
+async def session_status(session_id: str) -> SessionStatus:
+    """查询会话的后台处理进度：总结是否生成、每个视频的字幕是否就绪"""
+    try:
+        return await youtube_service.get_session_status(session_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.get("/corpus/search", response_model=CorpusSearchResponse)
+async def search_corpus(
+    q: str = Query(..., min_length=1, description="查询文本"),
+    limit: int = Query(default=20, ge=1, le=100, description="最多返回的片段数"),
+) -> CorpusSearchResponse:
+    """在所有入库过的视频字幕中全文检索，不消耗 YouTube 配额也不下载字幕"""
+    try:
+        segments = await youtube_service.search_corpus(q, limit)
+    except CorpusDisabledError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error("corpus_search_failed", query=q, error=str(e), exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    return CorpusSearchResponse(query=q, segments=segments)
+
+
+@app.get("/cache/stats")
+async def cache_stats() -> dict:
+    """LLM 响应缓存统计：条目数、命中率及因采样温度跳过的请求数"""
+    cache = youtube_service.openai_client.cache
+    return cache.stats() if cache else {"enabled": False}
+
+
 @app.post("/sessions/{session_id}/analyze", response_model=SessionAnalysisResponse)
 async def search_session_content(request: SessionAnalysisRequest) -> SessionAnalysisResponse:
     """分析会话内容，找到与问题相关的视频片段并生成回答"""
@@ -71,10 +231,11 @@ async def search_session_content(request: SessionAnalysisRequest) -> SessionAnal
                     session_id=request.session_id,
                     query=request.query)
 
-        result = await youtube_service.search_session_content(
-            session_id=request.session_id,
-            query=request.query
-        )
+        with request_deadline(REQUEST_TIMEOUT):
+            result = await youtube_service.search_session_content(
+                session_id=request.session_id,
+                query=request.query
+            )
 
         # 转换为响应模型
         clips = [VideoClip(**clip) for clip in result["clips"]]
@@ -93,9 +254,41 @@ async def search_session_content(request: SessionAnalysisRequest) -> SessionAnal
                      session_id=request.session_id,
                      error=str(e))
         raise HTTPException(status_code=404, detail=str(e))
+    except CircuitOpenError as e:
+        logger.warning("analyze_failed_upstream_unavailable",
+                       session_id=request.session_id,
+                       error=str(e))
+        raise _unavailable(e)
+    except DeadlineExceeded as e:
+        logger.warning("analyze_failed_deadline_exceeded",
+                       session_id=request.session_id,
+                       error=str(e))
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error("analyze_failed",
                      session_id=request.session_id,
                      error=str(e),
                      exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/sessions/{session_id}/analyze/stream")
+async def search_session_content_stream(
+    request: SessionAnalysisRequest,
+) -> StreamingResponse:
+    """分析会话内容，以 SSE 流式返回相关片段和逐字生成的回答"""
+    logger.info("analyze_stream_request_received",
+                session_id=request.session_id,
+                query=request.query)
+    try:
+        await youtube_service.get_session(request.session_id)
+    except ValueError as e:
+        logger.error("analyze_failed_invalid_session",
+                     session_id=request.session_id,
+                     error=str(e))
+        raise HTTPException(status_code=404, detail=str(e))
+
+    return _sse_response(youtube_service.search_session_content_stream(
+        session_id=request.session_id,
+        query=request.query
+    ))
@@ -0,0 +1,128 @@
+"""YouTube Data API 本地桩服务，用于测试和基准测试
+
+示例:
+    app = create_stub_app([make_video_item("abc123", "Python 教程")])
+    client = YouTubeClient(
+        api_key="test",
+        http_client=httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://stub",
+        ),
+    )
+
+也可以用 uvicorn 启动后通过 base_url 指向该服务:
+    uvicorn youtube_search.youtube_stub:app --port 8081
+"""
+import asyncio
+import random
+from collections import Counter
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Query
+
+
+def make_video_item(
+    video_id: str,
+    title: str = "",
+    channel_title: str = "Stub Channel",
+    duration: str = "PT10M",
+    view_count: int = 0,
+    published_at: str = "2024-01-01T00:00:00Z",
+    description: str = "",
+) -> Dict:
+    """构造 videos.list 响应中的单个视频条目
+
+    Args:
+        video_id: 视频ID
+        title: 视频标题
+        channel_title: 频道名称
+        duration: ISO 8601 格式时长
+        view_count: 观看次数
+        published_at: 发布时间
+        description: 视频描述
+
+    Returns:
+        Dict: videos.list 格式的视频条目
+    """
+    return {
+        "id": video_id,
+        "snippet": {
+            "title": title or f"Video {video_id}",
+            "channelTitle": channel_title,
+            "publishedAt": published_at,
+            "description": description,
+            "thumbnails": {
+                "high": {"url": f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"}
+            },
+        },
+        "contentDetails": {"duration": duration},
+        "statistics": {"viewCount": str(view_count)},
+    }
+
+
+def create_stub_app(
+    videos: Optional[List[Dict]] = None,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    seed: Optional[int] = None,
+) -> FastAPI:
+    """创建模拟 search.list 和 videos.list 的 FastAPI 应用
+
+    Args:
+        videos: videos.list 格式的视频条目列表，search.list 按顺序返回
+        latency: 每次请求的模拟延迟（秒）
+        jitter: 延迟的随机波动比例，实际延迟在 latency * (1 ± jitter) 之间
+        error_rate: 返回 503 错误的概率
+        seed: 随机数种子
+
+    Returns:
+        FastAPI: 桩服务应用，app.state.calls 记录各接口调用次数
+    """
+    items = list(videos or [make_video_item(f"stub{i:04d}") for i in range(50)])
+    by_id = {item["id"]: item for item in items}
+
+    stub = FastAPI(title="YouTube Data API Stub")
+    stub.state.calls = Counter()
+    rng = random.Random(seed)
+
+    async def simulate_upstream() -> None:
+        if latency:
+            await asyncio.sleep(latency * (1 + jitter * rng.uniform(-1, 1)))
+        if error_rate and rng.random() < error_rate:
+            raise HTTPException(status_code=503, detail="Simulated backend error")
+
+    @stub.get("/search")
+    async def search(
+        q: str = "",
+        maxResults: int = Query(default=5, ge=0, le=50),  # noqa: N803
+        pageToken: Optional[str] = None,  # noqa: N803
+    ) -> Dict:
+        stub.state.calls["search"] += 1
+        await simulate_upstream()
+        start = int(pageToken or 0)
+        page = items[start:start + maxResults]
+        response = {
+            "items": [
+                {"id": {"kind": "youtube#video", "videoId": item["id"]},
+                 "snippet": item["snippet"]}
+                for item in page
+            ]
+        }
+        if start + maxResults < len(items):
+            response["nextPageToken"] = str(start + maxResults)
+        return response
+
+    @stub.get("/videos")
+    async def list_videos(id: str = "") -> Dict:  # noqa: A002
+        stub.state.calls["videos"] += 1
+        await simulate_upstream()
+        ids = [video_id for video_id in id.split(",") if video_id]
+        if len(ids) > 50:
+            raise HTTPException(status_code=400, detail="Too many video ids")
+        return {"items": [by_id[video_id] for video_id in ids if video_id in by_id]}
+
+    return stub
+
+
+app = create_stub_app()
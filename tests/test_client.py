@@ -0,0 +1,48 @@
+import asyncio
+
+import httpx
+import pytest
+
+from youtube_search.client import YouTubeClient, is_upstream_failure
+from youtube_search.quota import QuotaScheduler
+from youtube_search.resilience import CircuitBreaker, CircuitOpenError
+
+
+def make_client(handler, quota: QuotaScheduler) -> YouTubeClient:
+    http = httpx.AsyncClient(
+        base_url="https://youtube.test", transport=httpx.MockTransport(handler))
+    breaker = CircuitBreaker(
+        "youtube", failure_threshold=2, recovery_timeout=60,
+        is_failure=is_upstream_failure)
+    return YouTubeClient(api_key="key", http_client=http, breaker=breaker, quota=quota)
+
+
+def test_rejected_calls_do_not_spend_quota():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(503)
+
+    async def run() -> None:
+        quota = QuotaScheduler(daily_units=10000, rate=1, burst=1000)
+        client = make_client(handler, quota)
+        try:
+            # 上游故障的调用已发出，照常计入配额
+            for i in range(2):
+                assert await client.search_videos(f"q{i}") == []
+            assert client.breaker.state == CircuitBreaker.OPEN
+            used, tokens = quota.used_units, quota.tokens
+            assert used == 200
+
+            for i in range(5):
+                with pytest.raises(CircuitOpenError) as info:
+                    await client.search_videos(f"open{i}")
+                assert info.value.name == "youtube"
+            assert len(requests) == 2
+            assert quota.used_units == used
+            assert quota.tokens == pytest.approx(tokens, abs=10)
+        finally:
+            await client.close()
+
+    asyncio.run(run())
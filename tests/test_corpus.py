@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from youtube_search.corpus import TranscriptCorpus
+from youtube_search.models import VideoInfo
+from youtube_search.transcript import CompactTranscript
+
+
+def make_video(video_id: str, view_count: int = 10) -> VideoInfo:
+    return VideoInfo(
+        video_id=video_id, title=f"Video {video_id}", channel_title="Channel",
+        duration="PT1M", view_count=view_count, published_at=datetime(2024, 1, 1),
+        thumbnail_url="", description="", has_subtitles=True)
+
+
+def make_transcript(*texts: str) -> CompactTranscript:
+    return CompactTranscript.from_subtitles([
+        {"text": text, "start": i * 5.0, "duration": 5.0}
+        for i, text in enumerate(texts)
+    ])
+
+
+def test_upsert_skips_unchanged_transcripts(tmp_path):
+    corpus = TranscriptCorpus(str(tmp_path / "corpus.db"))
+    try:
+        transcript = make_transcript("asyncio event loop", "缓存 延迟")
+        corpus.upsert(make_video("a"), transcript)
+        corpus.upsert(make_video("a", view_count=20), transcript)
+        assert corpus.stats()["upserts"] == 1
+        assert corpus.stats()["unchanged"] == 1
+        assert corpus.stats()["segments"] == 2
+
+        corpus.upsert(make_video("b"), make_transcript("event loop"))
+        corpus.upsert(make_video("a"), make_transcript("database index"))
+        stats = corpus.stats()
+        assert (stats["videos"], stats["segments"], stats["upserts"]) == (2, 2, 3)
+        assert corpus.search("asyncio") == []
+        assert [hit["video_id"] for hit in corpus.search("database")] == ["a"]
+        assert [hit["video_id"] for hit in corpus.search("loop")] == ["b"]
+    finally:
+        corpus.close()
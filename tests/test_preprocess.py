@@ -0,0 +1,24 @@
+from youtube_search.preprocess import clean_text, preprocess_subtitles
+
+
+def test_cjk_punctuation_and_digits_are_not_spaced():
+    text = "你好，世界。今天我们讲3个问题？"
+    segments, stats = preprocess_subtitles([{"text": text, "start": 0, "duration": 2}])
+    assert [segment["text"] for segment in segments] == [text]
+    assert stats.tokens <= stats.raw_tokens
+
+
+def test_western_text_keeps_word_spacing():
+    subtitles = [
+        {"text": "so um the event loop", "start": 0, "duration": 2},
+        {"text": "the event loop runs 3 tasks.", "start": 2, "duration": 4},
+    ]
+    segments, _ = preprocess_subtitles(subtitles)
+    assert [segment["text"] for segment in segments] == [
+        "so the event loop runs 3 tasks."]
+
+
+def test_only_known_sound_tags_are_removed():
+    text = "call f(x) then (see note 3)"
+    assert clean_text(f"{text} [Music]") == text
+    assert clean_text("[crowd murmuring]") == ""